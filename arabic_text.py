@@ -0,0 +1,58 @@
+"""
+Display-ready Arabic text.
+
+Tk does not shape Arabic or lay it out right to left, so text is reshaped with
+arabic_reshaper and reordered with python-bidi before it is shown. The same
+governorate, block and road names come up on card after card, so shaped text
+is memoized in a bounded cache. Any export or rendering path that needs
+display-ready Arabic can use shape_arabic directly.
+
+The shaping libraries are imported on first use.
+"""
+from functools import lru_cache
+from bhcard import GOVERNORATE_NAMES
+
+SHAPE_CACHE_SIZE = 1024
+
+
+def shape_arabic(text):
+    """
+    Reshape Arabic text so the letters connect and apply the bidirectional
+    algorithm for right-to-left display.
+
+    Args:
+        text (str): Text in logical order
+
+    Returns:
+        str: Text ready for display, or text unchanged if it is empty or cannot be shaped
+    """
+    if not text or text == "N/A":
+        return text
+
+    try:
+        return _shape(text)
+    except Exception as e:
+        print(f"Error formatting Arabic text: {e}")
+        return text
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def _shape(text):
+    # lru_cache does not store exceptions, so a failure is retried on the next call
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+
+    return get_display(arabic_reshaper.reshape(text))
+
+
+def preload(names=None):
+    """Shape names ahead of time, the governorate Arabic names by default"""
+    if names is None:
+        names = [name_ar for _, name_ar in GOVERNORATE_NAMES if name_ar]
+    for name in names:
+        shape_arabic(name)
+
+
+def cache_info():
+    """Hit and miss counts of the shaping cache"""
+    return _shape.cache_info()
@@ -0,0 +1,86 @@
+"""
+Run a simulated mass enrollment drive through enroll.py.
+
+Every simulated reader gets a stream of cards: a card is inserted, read and
+archived, and removed as soon as the enrollment reports it, followed after
+--swap-time seconds by the next card:
+
+    python bench_enroll.py --cards 100 --readers 2 --parallel --latency 0.005
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+from bench_read import check_card_data
+from cardarchive import CardArchiveReader, CardArchiveWriter
+from enroll import Enrollment, EnrollmentStats
+from simcard import SimulatedCard, SimulatedReader, SimulatedTransport
+
+
+def run(cards, readers, version, latency, parallel, pipelined, swap_time, archive_path):
+    """Enroll cards simulated cards and return (report, problems)"""
+    sim_readers = [SimulatedReader(f"Simulated Reader {i}") for i in range(readers)]
+    transport = SimulatedTransport(sim_readers)
+    done = {str(reader): threading.Event() for reader in sim_readers}
+    problems = []
+
+    def on_card(reader_name, card_data):
+        problems.extend(check_card_data(version, card_data))
+        done[reader_name].set()
+
+    enrollment = Enrollment(transport=transport, archive=CardArchiveWriter(archive_path),
+                            parallel=parallel, pipelined=pipelined, on_card=on_card)
+    enrollment.start()
+
+    def operator(index, reader):
+        # Cards are dealt round-robin over the readers
+        for number in range(index, cards, readers):
+            done[str(reader)].clear()
+            transport.insert_card(reader, SimulatedCard(version, serial=f"{20000000 + number}", latency=latency))
+            if not done[str(reader)].wait(60):
+                problems.append(f"card {number} was not reported")
+            transport.remove_card(reader)
+            time.sleep(swap_time)
+
+    threads = [threading.Thread(target=operator, args=(i, reader)) for i, reader in enumerate(sim_readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report = enrollment.stop()
+
+    records = sum(1 for _ in CardArchiveReader(archive_path))
+    if records != cards:
+        problems.append(f"{records} archive records for {cards} cards")
+    return report, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a mass enrollment drive")
+    parser.add_argument("--cards", type=int, default=50, help="cards to enroll")
+    parser.add_argument("--readers", type=int, default=2, help="simulated readers")
+    parser.add_argument("--version", default="V2", choices=("V1", "V2", "V2.1", "V4"), help="simulated card version")
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated seconds per APDU")
+    parser.add_argument("--parallel", action="store_true", help="read the readers in parallel")
+    parser.add_argument("--pipelined", action="store_true", help="overlap card I/O with parsing and saving")
+    parser.add_argument("--swap-time", type=float, default=0.0, help="seconds between removing a card and inserting the next")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive_path = os.path.join(directory, "enrollment.bhca")
+        # The per-card output of the enrollment is not needed here
+        with contextlib.redirect_stdout(io.StringIO()):
+            report, problems = run(args.cards, args.readers, args.version, args.latency, args.parallel,
+                                   args.pipelined, args.swap_time, archive_path)
+
+    print(EnrollmentStats.format_report(report))
+    if problems:
+        print("Problems: " + "; ".join(sorted(set(problems))))
+    raise SystemExit(1 if problems or report["failures"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark and check the card read path against simulated cards.
+
+    python bench_read.py --latency 0.005 --rounds 5
+"""
+import argparse
+import tempfile
+import time
+from bhcard import BahrainIDCard, APDUStats
+from simcard import SimulatedCard, SimulatedReader, SimulatedTransport, SAMPLE_PERSON
+
+
+def check_card_data(version, card_data):
+    """Return a list of mismatches between parsed data and what the simulated card holds"""
+    problems = []
+    if "error" in card_data:
+        return [card_data["error"]]
+    if card_data.get("card_type") != version:
+        problems.append(f"card_type {card_data.get('card_type')} != {version}")
+
+    personal = card_data.get("personal", {})
+    if personal.get("id_number") != SAMPLE_PERSON["id_number"]:
+        problems.append(f"id_number {personal.get('id_number')}")
+    expected_name = " ".join(n for n in SAMPLE_PERSON["names_en"] if n)
+    if personal.get("full_name_en") != expected_name:
+        problems.append(f"full_name_en {personal.get('full_name_en')}")
+    if card_data.get("card", {}).get("expiry_date") != "01/01/2030":
+        problems.append(f"expiry_date {card_data.get('card', {}).get('expiry_date')}")
+    if version != "V1" and card_data.get("address", {}).get("block_no") != SAMPLE_PERSON["block_no"]:
+        problems.append(f"block_no {card_data.get('address', {}).get('block_no')}")
+    return problems
+
+
+def run(version, rounds, latency, files=None, extended_length=True, report=False, error_rate=0.0, drop_rate=0.0,
+        pipelined=False, save_files=False):
+    """Read a simulated card several times and return (seconds per read, APDUs per read, problems)"""
+    sim_card = SimulatedCard(version, latency=latency, extended_length=extended_length,
+                             error_rate=error_rate, drop_rate=drop_rate, reset_on_drop=True)
+    bhcard = BahrainIDCard(transport=SimulatedTransport([SimulatedReader("Simulated Reader 0", sim_card)]))
+    if report:
+        bhcard.apdu_stats = APDUStats()
+
+    problems = []
+    elapsed = 0.0
+    apdus = 0
+    for _ in range(rounds):
+        if not bhcard.find_and_connect_reader():
+            return 0.0, 0, ["connect failed"]
+        with tempfile.TemporaryDirectory() as output_dir:
+            start_count = sim_card.apdu_count
+            start = time.perf_counter()
+            card_data = bhcard.read_card_data(save_files=save_files, output_dir=output_dir,
+                                              files=files, pipelined=pipelined)
+            elapsed += time.perf_counter() - start
+        apdus += sim_card.apdu_count - start_count
+        if files is None:
+            problems.extend(check_card_data(version, card_data))
+        if card_data.get("partial_files"):
+            problems.append(f"partial files {', '.join(card_data['partial_files'])}")
+        bhcard.disconnect()
+
+    if report:
+        print(APDUStats.format_report(card_data["apdu_report"]))
+        print(f"Card detection: {bhcard.detector.report()}")
+
+    return elapsed / rounds, apdus / rounds, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BahrainIDCard reads on simulated cards")
+    parser.add_argument("--rounds", type=int, default=3, help="reads per card version")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per APDU")
+    parser.add_argument("--files", nargs="*", help="only read these card files")
+    parser.add_argument("--short-only", action="store_true", help="simulate a reader without extended-length APDUs")
+    parser.add_argument("--report", action="store_true", help="print the APDU report of the last read per version")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of APDUs answered with 6F00")
+    parser.add_argument("--pipelined", action="store_true", help="overlap card I/O with parsing and saving")
+    parser.add_argument("--save", action="store_true", help="save each read to a temporary dump directory")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="share of APDUs that lose the connection and reset the card")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'version':8} {'ms/read':>10} {'APDUs/read':>11}  result")
+    for version in ("V1", "V2", "V2.1", "V4"):
+        seconds, apdus, problems = run(version, args.rounds, args.latency, args.files,
+                                    not args.short_only, args.report, args.error_rate, args.drop_rate,
+                                    args.pipelined, args.save)
+        failed = failed or bool(problems)
+        result = "ok" if not problems else "; ".join(sorted(set(problems)))
+        print(f"{version:8} {seconds * 1000:10.1f} {apdus:11.1f}  {result}")
+
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
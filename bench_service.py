@@ -0,0 +1,135 @@
+"""
+Load test for bhcard_service.py.
+
+Starts the service on a free localhost port with simulated readers and sends
+concurrent full and partial read requests, then reports throughput, latency
+percentiles and APDUs per request:
+
+    python bench_service.py --readers 2 --clients 8 --requests 200 --latency 0.002
+
+Use --url to load test a service that is already running instead.
+"""
+import argparse
+import contextlib
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import urlopen
+from bhcard import percentile
+from bhcard_service import create_server
+from simcard import SimulatedCard, SimulatedReader, SimulatedTransport, SAMPLE_PERSON
+
+# Request paths cycled through by the clients
+PATHS = ("/read", "/read/PersonalInfo,CardInfo", "/read/AddressInfo")
+
+
+def fetch(url):
+    """GET url and return (HTTP status, decoded JSON body, seconds)"""
+    start = time.perf_counter()
+    try:
+        with urlopen(url, timeout=60) as response:
+            status, body = response.status, response.read()
+    except HTTPError as e:
+        status, body = e.code, e.read()
+    return status, json.loads(body), time.perf_counter() - start
+
+
+def check_response(path, card_data):
+    """Return a problem description for a successful response with wrong data, or None"""
+    if path == "/read/AddressInfo":
+        if card_data.get("card_type") != "V1" and card_data.get("address", {}).get("block_no") != SAMPLE_PERSON["block_no"]:
+            return "wrong block_no"
+    elif card_data.get("personal", {}).get("id_number") != SAMPLE_PERSON["id_number"]:
+        return "wrong id_number"
+    return None
+
+
+def load_test(base_url, clients, requests, reader_names=None):
+    """
+    Send requests spread over clients concurrent clients.
+
+    Returns:
+        dict: Counts by status, latencies in seconds, problems and elapsed time
+    """
+    results = {"statuses": {}, "latencies": [], "problems": []}
+    lock = threading.Lock()
+
+    def client_request(index):
+        path = PATHS[index % len(PATHS)]
+        url = base_url + path
+        if reader_names:
+            # Every reader gets every kind of request
+            url += f"?reader={(index // len(PATHS)) % len(reader_names)}"
+        status, card_data, seconds = fetch(url)
+        problem = card_data.get("error") if status != 200 else check_response(path, card_data)
+        with lock:
+            results["statuses"][status] = results["statuses"].get(status, 0) + 1
+            results["latencies"].append(seconds)
+            if problem:
+                results["problems"].append(f"{path}: {problem}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(client_request, range(requests)))
+    results["elapsed"] = time.perf_counter() - start
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the card reading service")
+    parser.add_argument("--url", help="base URL of a running service (default: start one on simulated readers)")
+    parser.add_argument("--readers", type=int, default=2, help="simulated readers")
+    parser.add_argument("--version", default="V2", choices=("V1", "V2", "V2.1", "V4"), help="simulated card version")
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated seconds per APDU")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="total requests")
+    parser.add_argument("--max-queue", type=int, default=64, help="requests allowed to wait per reader")
+    args = parser.parse_args()
+
+    server = None
+    sim_cards = []
+    reader_names = None
+    base_url = args.url
+    if base_url is None:
+        sim_cards = [SimulatedCard(args.version, serial=f"{10000000 + i}", latency=args.latency)
+                     for i in range(args.readers)]
+        readers = [SimulatedReader(f"Simulated Reader {i}", card) for i, card in enumerate(sim_cards)]
+        server = create_server(port=0, transport=SimulatedTransport(readers), max_queue=args.max_queue, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        reader_names = [str(reader) for reader in readers]
+
+    try:
+        # The card library reports every read on stdout
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = load_test(base_url, args.clients, args.requests, reader_names)
+        _, health, _ = fetch(base_url + "/health")
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+            server.pool.close()
+
+    latencies = results["latencies"]
+    print(f"{args.requests} requests from {args.clients} clients in {results['elapsed']:.2f} s "
+          f"({args.requests / results['elapsed']:.1f} requests/s)")
+    print(f"Latency ms: p50 {percentile(latencies, 0.5) * 1000:.1f}  p90 {percentile(latencies, 0.9) * 1000:.1f}  "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f}  max {max(latencies) * 1000:.1f}")
+    print(f"Status codes: {', '.join(f'{status}: {count}' for status, count in sorted(results['statuses'].items()))}")
+    if sim_cards:
+        apdus = sum(card.apdu_count for card in sim_cards)
+        print(f"APDUs per request: {apdus / args.requests:.1f}")
+    for reader in health.get("readers", []):
+        print(f"  {reader['reader']}: {reader['reads']} reads, {reader['connects']} connects, "
+              f"{reader['errors']} errors, {reader['avg_read_ms']} ms/read")
+
+    if results["problems"]:
+        print("Problems: " + "; ".join(sorted(set(results["problems"]))))
+    raise SystemExit(1 if results["problems"] or set(results["statuses"]) != {200} else 0)
+
+
+if __name__ == "__main__":
+    main()
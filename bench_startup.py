@@ -0,0 +1,81 @@
+"""
+Startup-time benchmark for bhcard and gui, based on python -X importtime.
+
+Each module is imported in a fresh interpreter several times and the best
+cumulative import time is compared against a budget. The check also fails if
+the import pulls in a heavy optional dependency that should load lazily.
+
+    python bench_startup.py --max-bhcard-ms 150 --max-gui-ms 400
+"""
+import argparse
+import subprocess
+import sys
+
+# Modules that must not be imported just by importing each module
+LAZY_MODULES = {
+    "bhcard": ["PIL", "arabic_reshaper", "bidi", "tkinter"],
+    "gui": ["PIL", "arabic_reshaper", "bidi"]
+}
+
+
+def measure_import(module):
+    """
+    Import module in a fresh interpreter.
+
+    Returns:
+        tuple: (cumulative import time in ms, set of top-level modules imported)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    cumulative_us = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = [field.strip() for field in line[len("import time:"):].split("|")]
+        if not fields[0].isdigit():
+            continue
+        name = fields[2]
+        imported.add(name.split(".")[0])
+        if name == module:
+            cumulative_us = int(fields[1])
+    return cumulative_us / 1000, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check bhcard and gui import time")
+    parser.add_argument("--rounds", type=int, default=5, help="imports per module, the best one counts")
+    parser.add_argument("--max-bhcard-ms", type=float, default=150.0, help="import budget for bhcard")
+    parser.add_argument("--max-gui-ms", type=float, default=400.0, help="import budget for gui")
+    parser.add_argument("--skip-gui", action="store_true", help="only check bhcard (e.g. without Tk)")
+    args = parser.parse_args()
+
+    budgets = {"bhcard": args.max_bhcard_ms}
+    if not args.skip_gui:
+        budgets["gui"] = args.max_gui_ms
+
+    failed = False
+    for module, budget in budgets.items():
+        best_ms, imported = None, set()
+        for _ in range(args.rounds):
+            ms, imported = measure_import(module)
+            best_ms = ms if best_ms is None else min(best_ms, ms)
+
+        eager = sorted(set(LAZY_MODULES[module]) & imported)
+        ok = best_ms <= budget and not eager
+        failed = failed or not ok
+
+        print(f"{module:8} {best_ms:8.1f} ms (budget {budget:.0f} ms)  {'ok' if ok else 'FAIL'}")
+        if eager:
+            print(f"         imports {', '.join(eager)} at startup, these should load lazily")
+
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
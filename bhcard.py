@@ -1,159 +1,853 @@
-import sys
 import time
-import binascii
 from smartcard.System import readers
 from smartcard.util import toHexString, toBytes
 from smartcard.Exceptions import CardConnectionException, NoCardException
-from PIL import Image
-import io
+from smartcard.CardMonitoring import CardMonitor, CardObserver
 import os
 import json
+import queue
+import copy
+import base64
+import threading
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Bytes dropped from ASCII fields: everything except 0x01-0x7E
+ASCII_DELETE = bytes([0]) + bytes(range(127, 256))
+
+
+def decode_ascii_field(raw):
+    """Decode a fixed-width ASCII field, dropping null and non-printable bytes"""
+    return raw.tobytes().translate(None, ASCII_DELETE).decode("ascii").strip()
+
+
+def decode_utf8_field(raw):
+    """Decode a fixed-width UTF-8 field, dropping null characters"""
+    return str(raw, "utf-8", "ignore").replace("\x00", "").strip()
+
+
+def format_card_date(value):
+    """Format a YYYYMMDD date as DD/MM/YYYY, other values are returned unchanged"""
+    if len(value) == 8:
+        return f"{value[6:8]}/{value[4:6]}/{value[0:4]}"
+    return value
+
+
+def add_full_names(personal):
+    """Join the name parts into full_name_en and full_name_ar"""
+    for lang in ("en", "ar"):
+        parts = [personal[f"{part}_{lang}"] for part in
+                 ("first_name", "middle_name1", "middle_name2", "middle_name3", "middle_name4", "last_name")]
+        personal[f"full_name_{lang}"] = ' '.join([p for p in parts if p])
+    return personal
+
+
+FIELD_DECODERS = {
+    "ascii": decode_ascii_field,
+    "utf8": decode_utf8_field
+}
+
+
+def compile_layout(layout, finalize=None):
+    """
+    Compile a record layout into a parser for raw card file data.
+    
+    Args:
+        layout (list): (field, offset, length, encoding, post-processing) entries, where
+            encoding is a FIELD_DECODERS key and post-processing is None or a function
+            applied to the decoded string
+        finalize (callable): Called with the parsed dict to add derived fields
+        
+    Returns:
+        callable: parser(data) -> dict, slicing a single memoryview over data
+    """
+    fields = tuple(
+        (name, offset, offset + length, FIELD_DECODERS[encoding], post)
+        for name, offset, length, encoding, post in layout
+    )
+    
+    def parse(data):
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
+        view = memoryview(data)
+        record = {}
+        for name, start, end, decode, post in fields:
+            value = decode(view[start:end])
+            record[name] = post(value) if post else value
+        if finalize:
+            finalize(record)
+        return record
+    
+    return parse
+
+
+def zfill_id(value):
+    return value.zfill(9)
+
+
+def name_fields(en_offset, ar_offset):
+    """Layout entries for the six English and six Arabic name parts"""
+    parts = ("first_name", "middle_name1", "middle_name2", "middle_name3", "middle_name4", "last_name")
+    return ([(f"{part}_en", en_offset + i * 32, 32, "ascii", None) for i, part in enumerate(parts)] +
+            [(f"{part}_ar", ar_offset + i * 64, 64, "utf8", None) for i, part in enumerate(parts)])
+
+
+# Personal Information file (V2, V2.1 and V4 cards)
+PERSONAL_INFO_LAYOUT = [
+    ("id_number", 0, 9, "ascii", zfill_id),
+    *name_fields(9, 201),
+    ("gender", 585, 1, "ascii", None),
+    ("blood_group", 594, 3, "ascii", None),
+    ("birth_date", 586, 8, "ascii", format_card_date)
+]
+
+# Personal Information file (V1 cards)
+PERSONAL_INFO_LAYOUT_V1 = [
+    ("id_number", 8, 9, "ascii", zfill_id),
+    *name_fields(17, 209),
+    ("gender", 593, 1, "ascii", None),
+    ("blood_group", 594, 3, "ascii", None),
+    ("birth_date", 594, 8, "ascii", format_card_date)
+]
+
+# Card block of the V1 Personal Information file, only kept when the date is complete
+CARD_INFO_LAYOUT_V1 = [
+    ("expiry_date", 602, 8, "ascii", None)
+]
+
+# Card Information file
+CARD_INFO_LAYOUT = [
+    ("expiry_date", 0, 8, "ascii", format_card_date),
+    ("issue_date", 8, 8, "ascii", format_card_date),
+    ("issuing_authority", 16, 20, "ascii", None)
+]
+
+# Address Information file
+ADDRESS_INFO_LAYOUT = [
+    ("email", 0, 64, "utf8", None),
+    ("contact_no", 64, 12, "utf8", None),
+    ("residence_no", 76, 12, "utf8", None),
+    ("flat_no", 105, 4, "utf8", None),
+    ("building_no", 109, 4, "utf8", None),
+    ("building_alpha", 113, 1, "utf8", None),
+    ("building_alpha_arabic", 114, 2, "utf8", None),
+    ("road_no", 116, 4, "utf8", None),
+    ("road_name", 120, 64, "utf8", None),
+    ("road_name_arabic", 184, 128, "utf8", None),
+    ("block_no", 312, 4, "utf8", None),
+    ("block_name", 316, 64, "utf8", None),
+    ("block_name_arabic", 380, 128, "utf8", None),
+    ("governorate_no", 508, 4, "utf8", None)
+]
+
+PERSONAL_INFO_PARSER = compile_layout(PERSONAL_INFO_LAYOUT, add_full_names)
+PERSONAL_INFO_PARSER_V1 = compile_layout(PERSONAL_INFO_LAYOUT_V1, add_full_names)
+CARD_INFO_PARSER_V1 = compile_layout(CARD_INFO_LAYOUT_V1)
+CARD_INFO_PARSER = compile_layout(CARD_INFO_LAYOUT)
+ADDRESS_INFO_PARSER = compile_layout(ADDRESS_INFO_LAYOUT)
+
+
+# All APDUs in a flat dictionary with meaningful names
+APDU_COMMANDS = {
+    # Main applet selection
+    "SELECT_MAIN_APPLET": "00A404000DD4990000010101000100000001",
+
+    # Card management
+    "GET_SERIAL_V1": "D0020000 09",
+    "GET_SERIAL_V2": "80B80000 08",
+    "GET_SERIAL_V4": "80CA0101 13",
+    "SELECT_V2_SERIAL_APPLET": "00A4040010A0000000183003010000000000000000",
+
+    # V2.1 structure check
+    "SELECT_MF": "00A40004023F00",
+    "SELECT_EF_DIR": "00A40204022F00",
+
+    # Directory selection
+    "SELECT_CPR_DIR_V1": "00A404000BF000000078010001435052",
+    "SELECT_IMM_DIR_V1": "00A404000BF000000078010002494D4D",
+    "SELECT_CPR_DIR_V2": "00A4000C020101",
+    "SELECT_IMM_DIR_V2": "00A4000C020301",
+
+    # File selection commands
+    "SELECT_PERSONAL_INFO_V1": "80A40804020001",
+    "SELECT_PERSONAL_INFO_V2": "00A4020C020001",
+    "SELECT_CARD_INFO_V2": "00A4020C020002",
+    "SELECT_PHOTO_SIG_V1": "80A40804020002",
+    "SELECT_PHOTO_SIG_V2": "00A4020C020003",
+    "SELECT_ADDRESS_V1": "80A40804020003",
+    "SELECT_ADDRESS_V2": "00A4020C020005",
+    "SELECT_EMPLOYMENT_V2": "00A4020C020006",
+    "SELECT_IMM_BASIC_V1": "80A40804020001",
+    "SELECT_IMM_BASIC_V2": "00A4020C020001",
+    "SELECT_IMM_DETAILS_V1": "80A40804020002", 
+    "SELECT_IMM_DETAILS_V2": "00A4020C020002",
+    "SELECT_IMM_ADDITIONAL_V1": "80A40804020003",
+    "SELECT_IMM_ADDITIONAL_V2": "00A4020C020003"
+}
+
+# Encoded once here instead of on every send
+ENCODED_APDU_COMMANDS = {name: toBytes(apdu) for name, apdu in APDU_COMMANDS.items()}
+
+# Files of each card version in read order:
+# (file name, directory select command, file select command, length)
+V1_FILES = (
+    ("PersonalInfo", "SELECT_CPR_DIR_V1", "SELECT_PERSONAL_INFO_V1", 610),
+    ("AddressInfo", "SELECT_CPR_DIR_V1", "SELECT_ADDRESS_V1", 711),
+    ("PhotoSignature", "SELECT_CPR_DIR_V1", "SELECT_PHOTO_SIG_V1", 6006),
+    ("ImmigrationBasic", "SELECT_IMM_DIR_V1", "SELECT_IMM_BASIC_V1", 72),
+    ("ImmigrationDetails", "SELECT_IMM_DIR_V1", "SELECT_IMM_DETAILS_V1", 53),
+    ("ImmigrationAdditional", "SELECT_IMM_DIR_V1", "SELECT_IMM_ADDITIONAL_V1", 39)
+)
+
+V2_FILES = (
+    ("PersonalInfo", "SELECT_CPR_DIR_V2", "SELECT_PERSONAL_INFO_V2", 597),
+    ("CardInfo", "SELECT_CPR_DIR_V2", "SELECT_CARD_INFO_V2", 36),
+    ("AddressInfo", "SELECT_CPR_DIR_V2", "SELECT_ADDRESS_V2", 512),
+    ("PhotoSignature", "SELECT_CPR_DIR_V2", "SELECT_PHOTO_SIG_V2", 6000),
+    ("EmploymentInfo", "SELECT_CPR_DIR_V2", "SELECT_EMPLOYMENT_V2", 1590),
+    ("ImmigrationBasic", "SELECT_IMM_DIR_V2", "SELECT_IMM_BASIC_V2", 6),
+    ("ImmigrationDetails", "SELECT_IMM_DIR_V2", "SELECT_IMM_DETAILS_V2", 47),
+    ("ImmigrationAdditional", "SELECT_IMM_DIR_V2", "SELECT_IMM_ADDITIONAL_V2", 33)
+)
+
+
+def compile_read_plan(applet, files):
+    """
+    Compile the read plan of a card version.
+    
+    Args:
+        applet (str): Command selecting the applet that holds the files
+        files (tuple): (file name, directory select, file select, length) entries
+        
+    Returns:
+        dict: {"applet": ..., "files": {file name: ((applet, directory, file select), length)}}
+        with files in read order. Every command name is checked against APDU_COMMANDS.
+    """
+    compiled = {"applet": applet, "files": {}}
+    for file_name, dir_command, select_command, length in files:
+        path = (applet, dir_command, select_command)
+        for name in path:
+            if name not in ENCODED_APDU_COMMANDS:
+                raise KeyError(f"Read plan uses unknown command {name}")
+        compiled["files"][file_name] = (path, length)
+    return compiled
+
+
+# V2.1 and V4 cards have the V2 file layout
+READ_PLANS = {
+    "V1": compile_read_plan("SELECT_MAIN_APPLET", V1_FILES),
+    "V2": compile_read_plan("SELECT_MAIN_APPLET", V2_FILES),
+    "V2.1": compile_read_plan("SELECT_MAIN_APPLET", V2_FILES),
+    "V4": compile_read_plan("SELECT_MAIN_APPLET", V2_FILES)
+}
+
+
+# Governorates with their block ID ranges. Some ranges overlap: a block in more
+# than one range belongs to the governorate listed first, and SPECIAL_BLOCKS
+# override the ranges.
+GOVERNORATE_RANGES = (
+    {
+        "name_en": "CAPITAL", 
+        "name_ar": "العاصمة",
+        "ranges": (
+            (301, 369),  # Main Capital blocks
+            (380, 382),  # Additional Capital blocks
+            (401, 438),  # Northern Capital areas
+            (601, 634),  # Southern Capital areas
+            (701, 713),  # Eastern Capital regions
+            (816, 816),  # Special Capital area
+            (729, 729),  # Special Capital area
+            (733, 733),  # Special Capital area
+            (743, 745)   # Special Capital areas
+        )
+    },
+    {
+        "name_en": "NORTHERN", 
+        "name_ar": "الشمالية",
+        "ranges": (
+            (431, 465),  # Main Northern region
+            (469, 481),  # Northern suburbs
+            (502, 590),  # Central Northern region
+            (702, 714),  # Northern industrial area
+            (730, 744),  # Northern residential areas
+            (752, 762),  # Northern coastal areas
+            (1001, 1046),  # Northern new developments
+            (1203, 1218)   # Northern expansion projects
+        )
+    },
+    {
+        "name_en": "MUHARRAQ", 
+        "name_ar": "المحرق",
+        "ranges": (
+            (101, 128),  # Main Muharraq island
+            (201, 269)   # Muharraq extensions
+        )
+    },
+    {
+        "name_en": "SOUTHERN", 
+        "name_ar": "الجنوبية",
+        "ranges": (
+            (613, 616),  # Southern border area
+            (635, 636),  # Southern industrial zone
+            (643, 646),  # Southern special economic zone
+            (718, 720),  # Southern coastal area
+            (746, 748),  # Southern development area
+            (801, 816),  # Main Southern region
+            (901, 943),  # Southern suburbs
+            (944, 986),  # Southern expansion
+            (997, 999),  # Southern new projects
+            (1051, 1070),  # Southern satellite developments
+            (1101, 1113)   # Southern future expansion
+        )
+    }
+)
+
+# Special cases for blocks that don't fit in ranges
+SPECIAL_BLOCKS = {
+    591: ("NORTHERN", "الشمالية"),
+    592: ("CAPITAL", "العاصمة"),
+    644: ("CAPITAL", "العاصمة"),
+    625: ("CAPITAL", "العاصمة"),
+    626: ("CAPITAL", "العاصمة"),
+    815: ("CAPITAL", "العاصمة")
+}
+
+# Governorate names by code; code 0 means unknown
+GOVERNORATE_NAMES = ((None, None),) + tuple((gov["name_en"], gov["name_ar"]) for gov in GOVERNORATE_RANGES)
+
+
+def build_governorate_index():
+    """
+    Build a dense block ID -> governorate code table over the whole block ID space.
+    
+    Returns:
+        bytes: GOVERNORATE_NAMES code for every block ID from 0 to the highest known block
+    """
+    max_block = max([end for gov in GOVERNORATE_RANGES for _, end in gov["ranges"]] + list(SPECIAL_BLOCKS))
+    index = bytearray(max_block + 1)
+    
+    # Fill in reverse order so governorates listed first win on overlaps
+    for code in range(len(GOVERNORATE_RANGES), 0, -1):
+        for start, end in GOVERNORATE_RANGES[code - 1]["ranges"]:
+            index[start:end + 1] = bytes([code]) * (end - start + 1)
+    
+    for block, names in SPECIAL_BLOCKS.items():
+        index[block] = GOVERNORATE_NAMES.index(names)
+    return bytes(index)
+
+
+# Immutable index built once at import. Numeric code arrays can be annotated in bulk
+# with e.g. numpy.frombuffer(GOVERNORATE_INDEX, numpy.uint8)[block_ids].
+GOVERNORATE_INDEX = build_governorate_index()
+
+
+def lookup_governorate(block_id):
+    """Return (name_en, name_ar) for a block ID given as int or string, (None, None) if unknown"""
+    try:
+        block_num = block_id if isinstance(block_id, int) else int(block_id.strip())
+    except (ValueError, TypeError, AttributeError):
+        # If block_id is not a valid number
+        return None, None
+    if 0 <= block_num < len(GOVERNORATE_INDEX):
+        return GOVERNORATE_NAMES[GOVERNORATE_INDEX[block_num]]
+    return None, None
+
+
+def lookup_governorates(block_ids):
+    """
+    Look up governorate names for many block IDs at once.
+    
+    Args:
+        block_ids: Iterable of block IDs (ints or strings), or an array with tolist()
+        
+    Returns:
+        list: (name_en, name_ar) per block ID, (None, None) for unknown blocks
+    """
+    if hasattr(block_ids, "tolist"):
+        block_ids = block_ids.tolist()
+    index, names, size = GOVERNORATE_INDEX, GOVERNORATE_NAMES, len(GOVERNORATE_INDEX)
+    unknown = names[0]
+    return [
+        names[index[b]] if type(b) is int and 0 <= b < size
+        else unknown if type(b) is int
+        else lookup_governorate(b)
+        for b in block_ids
+    ]
+
+
+class ReadCancelledError(Exception):
+    """Raised by BahrainIDCard.transmit once the card's cancel_event is set"""
+
+
+class CardChangedError(Exception):
+    """Raised when a reconnect finds a different card than the one being read"""
+
+
+class APDUStats:
+    """
+    Collects the APDU records reported by BahrainIDCard.transmit and aggregates them
+    into a report with per-command and per-file totals and a latency histogram.
+    
+    Usage:
+        bhcard.apdu_stats = APDUStats()
+        card_data = bhcard.read_card_data()
+        print(APDUStats.format_report(card_data["apdu_report"]))
+    """
+    
+    def __init__(self, histogram_bounds_ms=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)):
+        self.histogram_bounds_ms = histogram_bounds_ms
+        self.records = []
+    
+    def add(self, record):
+        """Store one APDU record"""
+        self.records.append(record)
+    
+    def reset(self):
+        """Drop all collected records"""
+        self.records = []
+    
+    @staticmethod
+    def empty_totals():
+        return {"apdus": 0, "time": 0.0, "bytes_sent": 0, "bytes_received": 0, "errors": 0}
+    
+    def report(self):
+        """Aggregate the collected records into a JSON-serializable dict"""
+        histogram = {f"<={bound}ms": 0 for bound in self.histogram_bounds_ms}
+        histogram[f">{self.histogram_bounds_ms[-1]}ms"] = 0
+        by_command = {}
+        by_file = {}
+        total = self.empty_totals()
+        
+        for record in self.records:
+            ms = record["duration"] * 1000
+            for bound in self.histogram_bounds_ms:
+                if ms <= bound:
+                    histogram[f"<={bound}ms"] += 1
+                    break
+            else:
+                histogram[f">{self.histogram_bounds_ms[-1]}ms"] += 1
+            
+            failed = record["error"] is not None or record["sw"] not in ("9000", "6115")
+            file_name = record["file"] or "(none)"
+            command_totals = by_command.setdefault(record["name"], self.empty_totals())
+            file_totals = by_file.setdefault(file_name, self.empty_totals())
+            for totals in (total, command_totals, file_totals):
+                totals["apdus"] += 1
+                totals["time"] += record["duration"]
+                totals["bytes_sent"] += record["command_size"]
+                totals["bytes_received"] += record["response_size"]
+                totals["errors"] += failed
+        
+        return {
+            "card_type": self.records[-1]["card_type"] if self.records else None,
+            "total": total,
+            "by_command": by_command,
+            "by_file": by_file,
+            "latency_histogram": histogram
+        }
+    
+    @staticmethod
+    def format_report(report):
+        """Format a report from report() as a printable table"""
+        lines = [f"Card type: {report['card_type']}"]
+        total = report["total"]
+        lines.append(f"Total: {total['apdus']} APDUs, {total['time'] * 1000:.1f} ms, "
+                     f"{total['bytes_sent']} bytes sent, {total['bytes_received']} bytes received, "
+                     f"{total['errors']} errors")
+        for title, section in (("Command", report["by_command"]), ("File", report["by_file"])):
+            lines.append(f"{title:<26} {'APDUs':>6} {'ms':>9} {'bytes in':>9} {'errors':>7}")
+            for key, totals in section.items():
+                lines.append(f"{key:<26} {totals['apdus']:>6} {totals['time'] * 1000:>9.1f} "
+                             f"{totals['bytes_received']:>9} {totals['errors']:>7}")
+        lines.append("Latency: " + ", ".join(f"{k}: {v}" for k, v in report["latency_histogram"].items() if v))
+        return "\n".join(lines)
+
+
+def percentile(values, fraction):
+    """Value at fraction (0-1) of the sorted values, 0.0 for no values"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class CardDataCache:
+    """
+    LRU cache of parsed card data keyed by card ATR and serial number.
+    
+    Entries expire after ttl seconds and the least recently used entry is evicted
+    once max_entries is reached. With a path the cache is loaded on creation and
+    written by save(), so it survives restarts.
+    """
+    
+    # Card data fields holding raw bytes, stored base64-encoded on disk
+    binary_fields = ("photo_data", "signature_data")
+    # Card data fields describing one read rather than the card, never cached
+    read_fields = ("apdu_report", "from_cache", "dump_time", "output_dir", "archive_offset",
+                   "read_retries", "partial_files", "read_seconds")
+    
+    def __init__(self, max_entries=256, ttl=600, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+    
+    @staticmethod
+    def make_key(atr, serial):
+        return f"{atr}:{serial}"
+    
+    def get(self, atr, serial, files=None):
+        """
+        Return a copy of the cached card data, or None on a miss.
+        
+        Args:
+            files (iterable): Card files the caller needs; entries missing any of them are misses
+        """
+        key = self.make_key(atr, serial)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            stored_at, stored_files, card_data = entry
+            if time.time() - stored_at > self.ttl:
+                del self.entries[key]
+                return None
+            if files is not None and not set(files) <= stored_files:
+                return None
+            self.entries.move_to_end(key)
+            return copy.deepcopy(card_data)
+    
+    def put(self, atr, serial, card_data, files):
+        """Store parsed card data read with the given card files, evicting the least recently used entries"""
+        if "error" in card_data:
+            return
+        card_data = {k: v for k, v in card_data.items() if k not in self.read_fields}
+        key = self.make_key(atr, serial)
+        with self.lock:
+            self.entries[key] = (time.time(), set(files), copy.deepcopy(card_data))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def save(self, path=None):
+        """Write the unexpired entries to a JSON file"""
+        path = path or self.path
+        now = time.time()
+        with self.lock:
+            items = [(k, t, f, d) for k, (t, f, d) in self.entries.items() if now - t <= self.ttl]
+        
+        entries = []
+        for key, stored_at, files, card_data in items:
+            card_data = dict(card_data)
+            for field in self.binary_fields:
+                if field in card_data:
+                    card_data[field] = base64.b64encode(bytes(card_data[field])).decode("ascii")
+            entries.append({"key": key, "stored_at": stored_at, "files": sorted(files), "card_data": card_data})
+        
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def load(self, path=None):
+        """Load entries written by save(), skipping expired ones"""
+        path = path or self.path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading card cache {path}: {e}")
+            return
+        
+        now = time.time()
+        with self.lock:
+            for entry in stored.get("entries", []):
+                if now - entry["stored_at"] > self.ttl:
+                    continue
+                # Files written by older versions may still hold per-read fields
+                card_data = {k: v for k, v in entry["card_data"].items() if k not in self.read_fields}
+                for field in self.binary_fields:
+                    if field in card_data:
+                        card_data[field] = base64.b64decode(card_data[field])
+                self.entries[entry["key"]] = (entry["stored_at"], set(entry["files"]), card_data)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class PCSCTransport:
+    """Default transport that lists the PC/SC readers known to pyscard"""
+    
+    def readers(self):
+        """Return the available readers, each providing createConnection()"""
+        return readers()
+    
+    def add_observer(self, observer):
+        """Register a CardObserver for card insertion and removal events"""
+        CardMonitor().addObserver(observer)
+    
+    def delete_observer(self, observer):
+        """Unregister a CardObserver added with add_observer"""
+        CardMonitor().deleteObserver(observer)
+
+
+class CardProfileDetector:
+    """
+    Identify the card profile (V1, V2, V2.1, V4) of a connected BahrainIDCard.
+    
+    Most profiles follow from the ATR. V2 and V2.1 share ATRs and are told apart
+    by markers in EF-DIR, which is read in small steps until a marker turns up.
+    The result is cached by ATR and card serial, so a card seen before costs
+    only the serial read, which read_card_data then reuses.
+    
+    stats counts detections, cache hits, the APDUs sent and the time spent.
+    Pass a subclass or any object with detect(card) to BahrainIDCard to change
+    how profiles are identified.
+    """
+    
+    V2_ATR_PREFIXES = ("3B7A9600008065A2010101",)
+    V2_ATRS = ("3B888001E1F35E1177",)
+    V21_MARKERS = (bytes.fromhex("3F0001019F08020311"), bytes.fromhex("3F0001019F0803030101"))
+    
+    def __init__(self, max_entries=1024, ef_dir_steps=(128, 335)):
+        """
+        Args:
+            max_entries (int): Detection results to keep, least recently used go first
+            ef_dir_steps (tuple): EF-DIR lengths read so far at each step, the last
+                one is the most that is ever read
+        """
+        self.max_entries = max_entries
+        self.ef_dir_steps = ef_dir_steps
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"detections": 0, "cache_hits": 0, "apdus": 0, "seconds": 0.0}
+    
+    def detect(self, card):
+        """
+        Identify the profile of the card connected to card.
+        
+        Returns:
+            str: "V1", "V2", "V2.1", "V4" or "Unknown"
+        """
+        apdus = []
+        card.apdu_hooks.append(apdus.append)
+        start = time.perf_counter()
+        try:
+            return self.detect_profile(card)
+        finally:
+            card.apdu_hooks.remove(apdus.append)
+            with self.lock:
+                self.stats["detections"] += 1
+                self.stats["apdus"] += len(apdus)
+                self.stats["seconds"] += time.perf_counter() - start
+    
+    def detect_profile(self, card):
+        atr = card.atr
+        if atr.startswith("3B670000A81041"):
+            return "V1"
+        if atr.startswith("3B7F"):
+            return "V4"
+        if not (atr.startswith(self.V2_ATR_PREFIXES) or atr in self.V2_ATRS):
+            return "Unknown"
+        
+        # Provisional type so the serial and READ BINARY commands are built for V2
+        card.card_type = "V2"
+        try:
+            card.card_serial = card.read_card_serial()
+        except Exception as e:
+            print(f"Error reading card serial: {e}")
+        
+        key = (atr, card.card_serial)
+        if card.card_serial:
+            with self.lock:
+                card_type = self.entries.get(key)
+                if card_type is not None:
+                    self.entries.move_to_end(key)
+                    self.stats["cache_hits"] += 1
+                    return card_type
+        
+        try:
+            card_type = "V2.1" if self.find_v21_markers(card) else "V2"
+        except Exception as e:
+            # Not cached, the next connect checks again
+            print(f"Error checking V2.1 structure: {e}")
+            return "V2"
+        
+        if card.card_serial:
+            with self.lock:
+                self.entries[key] = card_type
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return card_type
+    
+    def check_v21_structure(self, card):
+        """Check if card has V2.1 structure"""
+        try:
+            return self.find_v21_markers(card)
+        except Exception as e:
+            print(f"Error checking V2.1 structure: {e}")
+            return False
+    
+    def find_v21_markers(self, card):
+        """Check EF-DIR for the V2.1 markers, reading no more of it than needed"""
+        # Select CIO Applet, MF and EF-DIR. The MF replaces the applet in
+        # selected_path, so the read after detection selects the applet again.
+        if card.select_path(("SELECT_MAIN_APPLET", "SELECT_MF", "SELECT_EF_DIR")):
+            return False
+        
+        data = bytearray()
+        for length in self.ef_dir_steps:
+            wanted = length - len(data)
+            chunk = card.read_binary_data(len(data), wanted)
+            data += chunk
+            if any(marker in data for marker in self.V21_MARKERS):
+                return True
+            if len(chunk) < wanted:
+                # Stop at the end of EF-DIR, anything else leaves the profile undecided
+                if card.last_read_error and not card.last_read_error.startswith(("status 62", "status 6B")):
+                    raise CardConnectionException(card.last_read_error)
+                break
+        return False
+    
+    def report(self):
+        """Return a copy of the detection statistics"""
+        with self.lock:
+            return dict(self.stats, cached=len(self.entries))
+
 
 class BahrainIDCard:
-    def __init__(self):
-        """Initialize the BahrainIDCard class"""
+    # Governorate tables, see GOVERNORATE_INDEX for the lookup
+    governorate_ranges = GOVERNORATE_RANGES
+    special_blocks = SPECIAL_BLOCKS
+    
+    def __init__(self, transport=None, cache=None, detector=None):
+        """
+        Initialize the BahrainIDCard class
+        
+        Args:
+            transport: Object whose readers() method returns pyscard-compatible readers.
+                Defaults to the PC/SC readers; simcard.SimulatedTransport runs without hardware.
+            cache (CardDataCache): Optional cache of parsed card data, consulted by
+                read_card_data after reading the card serial
+            detector (CardProfileDetector): Identifies the card type on connect,
+                share one between instances to share its cache
+        """
+        self.transport = transport or PCSCTransport()
+        self.cache = cache
+        self.detector = detector or CardProfileDetector()
         self.connection = None
+        self.atr = None
         self.card_type = None
+        self.card_serial = None
+        # Whether card_serial was read while identifying the card and not used yet
+        self.serial_from_detection = False
         self.data = {}
         self.output_dir = None
         
-        # Define all APDUs in a flat dictionary with meaningful names
-        self.apdu_commands = {
-            # Main applet selection
-            "SELECT_MAIN_APPLET": "00A404000DD4990000010101000100000001",
-            
-            # Card management
-            "GET_SERIAL_V1": "D0020000 09",
-            "GET_SERIAL_V2": "80B80000 08",
-            "GET_SERIAL_V4": "80CA0101 13",
-            "SELECT_V2_SERIAL_APPLET": "00A4040010A0000000183003010000000000000000",
-            
-            # Directory selection
-            "SELECT_CPR_DIR_V1": "00A404000BF000000078010001435052",
-            "SELECT_IMM_DIR_V1": "00A404000BF000000078010002494D4D",
-            "SELECT_CPR_DIR_V2": "00A4000C020101",
-            "SELECT_IMM_DIR_V2": "00A4000C020301",
-            
-            # File selection commands
-            "SELECT_PERSONAL_INFO_V1": "80A40804020001",
-            "SELECT_PERSONAL_INFO_V2": "00A4020C020001",
-            "SELECT_CARD_INFO_V2": "00A4020C020002",
-            "SELECT_PHOTO_SIG_V1": "80A40804020002",
-            "SELECT_PHOTO_SIG_V2": "00A4020C020003",
-            "SELECT_ADDRESS_V1": "80A40804020003",
-            "SELECT_ADDRESS_V2": "00A4020C020005",
-            "SELECT_EMPLOYMENT_V2": "00A4020C020006",
-            "SELECT_IMM_BASIC_V1": "80A40804020001",
-            "SELECT_IMM_BASIC_V2": "00A4020C020001",
-            "SELECT_IMM_DETAILS_V1": "80A40804020002", 
-            "SELECT_IMM_DETAILS_V2": "00A4020C020002",
-            "SELECT_IMM_ADDITIONAL_V1": "80A40804020003",
-            "SELECT_IMM_ADDITIONAL_V2": "00A4020C020003"
-        }
+        # READ BINARY chunk sizes to try, largest first. Sizes above 256 need
+        # extended-length APDUs, 256 is a short APDU with Le=0x00. max_read_length
+        # caps the chunk size once a size has been rejected, proven_read_length is
+        # the longest read that has succeeded. A read longer than that is a probe,
+        # and if it is rejected the cap steps down to the next candidate; set
+        # max_read_length to 255 to disable probing.
+        self.read_length_candidates = [4096, 1024, 256]
+        self.max_read_length = None
+        self.proven_read_length = 0
         
-        # Add governorate lookup
-        self.add_governorate_lookup()
-    
-    def add_governorate_lookup(self):
-        """Create an efficient lookup system for governorate names by block ID ranges"""
-        # Define the governorate data with block ID ranges
-        self.governorate_ranges = [
-            {
-                "name_en": "CAPITAL", 
-                "name_ar": "العاصمة",
-                "ranges": [
-                    (301, 369),  # Main Capital blocks
-                    (380, 382),  # Additional Capital blocks
-                    (401, 438),  # Northern Capital areas
-                    (601, 634),  # Southern Capital areas
-                    (701, 713),  # Eastern Capital regions
-                    (816, 816),  # Special Capital area
-                    (729, 729),  # Special Capital area
-                    (733, 733),  # Special Capital area
-                    (743, 745)   # Special Capital areas
-                ]
-            },
-            {
-                "name_en": "NORTHERN", 
-                "name_ar": "الشمالية",
-                "ranges": [
-                    (431, 465),  # Main Northern region
-                    (469, 481),  # Northern suburbs
-                    (502, 590),  # Central Northern region
-                    (702, 714),  # Northern industrial area
-                    (730, 744),  # Northern residential areas
-                    (752, 762),  # Northern coastal areas
-                    (1001, 1046),  # Northern new developments
-                    (1203, 1218)   # Northern expansion projects
-                ]
-            },
-            {
-                "name_en": "MUHARRAQ", 
-                "name_ar": "المحرق",
-                "ranges": [
-                    (101, 128),  # Main Muharraq island
-                    (201, 269)   # Muharraq extensions
-                ]
-            },
-            {
-                "name_en": "SOUTHERN", 
-                "name_ar": "الجنوبية",
-                "ranges": [
-                    (613, 616),  # Southern border area
-                    (635, 636),  # Southern industrial zone
-                    (643, 646),  # Southern special economic zone
-                    (718, 720),  # Southern coastal area
-                    (746, 748),  # Southern development area
-                    (801, 816),  # Main Southern region
-                    (901, 943),  # Southern suburbs
-                    (944, 986),  # Southern expansion
-                    (997, 999),  # Southern new projects
-                    (1051, 1070),  # Southern satellite developments
-                    (1101, 1113)   # Southern future expansion
-                ]
-            }
+        # A failed APDU is retried up to max_retries times, waiting retry_backoff
+        # seconds and doubling the wait each time. After a lost connection
+        # (needs_recovery) the card is reconnected and the applet, directory and file
+        # in selected_path are selected again, so reads resume at the offset that
+        # failed, after checking that the ATR and serial still match. retries counts
+        # retries per read, recoveries the reconnects.
+        self.max_retries = 3
+        self.retry_backoff = 0.05
+        # SW1 values of transient errors that are worth retrying (warnings and
+        # memory errors, no precise diagnosis)
+        self.transient_sw1 = (0x64, 0x65, 0x6F)
+        self.retries = 0
+        self.recoveries = 0
+        self.recovering = False
+        self.selected_path = []
+        self.needs_recovery = False
+        self.partial_files = {}
+        self.last_read_error = None
+        
+        # APDUs by name, as hex strings and encoded once at import
+        self.apdu_commands = APDU_COMMANDS
+        self.encoded_commands = ENCODED_APDU_COMMANDS
+        
+        # Elementary files that read_card_data knows how to read
+        self.card_files = [
+            "PersonalInfo",
+            "CardInfo",
+            "PhotoSignature",
+            "AddressInfo",
+            "EmploymentInfo",
+            "ImmigrationBasic",
+            "ImmigrationDetails",
+            "ImmigrationAdditional"
         ]
         
-        # Special cases for blocks that don't fit in ranges
-        self.special_blocks = {
-            591: ("NORTHERN", "الشمالية"),
-            592: ("CAPITAL", "العاصمة"),
-            644: ("CAPITAL", "العاصمة"),
-            625: ("CAPITAL", "العاصمة"),
-            626: ("CAPITAL", "العاصمة"),
-            815: ("CAPITAL", "العاصمة")
+        # Read plan of each card version, see READ_PLANS
+        self.read_plans = READ_PLANS
+        
+        self.file_descriptions = {
+            "PersonalInfo": "Basic personal information (name, ID, etc.)",
+            "CardInfo": "Card issuance and expiry information",
+            "PhotoSignature": "Photo and signature images",
+            "AddressInfo": "Residential address and contact information",
+            "EmploymentInfo": "Employment and occupation details",
+            "ImmigrationBasic": "Basic immigration information",
+            "ImmigrationDetails": "Detailed immigration status and information",
+            "ImmigrationAdditional": "Additional immigration-related data"
+        }
+        
+        # File selected by each file selection command, used to attribute APDUs to files
+        self.file_select_commands = {
+            "SELECT_EF_DIR": "EF-DIR",
+            "SELECT_PERSONAL_INFO_V1": "PersonalInfo",
+            "SELECT_PERSONAL_INFO_V2": "PersonalInfo",
+            "SELECT_CARD_INFO_V2": "CardInfo",
+            "SELECT_PHOTO_SIG_V1": "PhotoSignature",
+            "SELECT_PHOTO_SIG_V2": "PhotoSignature",
+            "SELECT_ADDRESS_V1": "AddressInfo",
+            "SELECT_ADDRESS_V2": "AddressInfo",
+            "SELECT_EMPLOYMENT_V2": "EmploymentInfo",
+            "SELECT_IMM_BASIC_V1": "ImmigrationBasic",
+            "SELECT_IMM_BASIC_V2": "ImmigrationBasic",
+            "SELECT_IMM_DETAILS_V1": "ImmigrationDetails",
+            "SELECT_IMM_DETAILS_V2": "ImmigrationDetails",
+            "SELECT_IMM_ADDITIONAL_V1": "ImmigrationAdditional",
+            "SELECT_IMM_ADDITIONAL_V2": "ImmigrationAdditional"
         }
         
-        print("Loaded optimized governorate lookup data")
+        # APDU instrumentation: hooks are called with one record dict per APDU,
+        # apdu_stats is an optional APDUStats collector reported by read_card_data
+        self.apdu_hooks = []
+        self.apdu_stats = None
+        self.current_file = None
+        
+        # Set from another thread to abort the read in progress at its next APDU
+        self.cancel_event = threading.Event()
     
     def get_governorate_names(self, block_id):
-        """Get governorate names for a block ID using range-based lookup"""
-        if not hasattr(self, 'governorate_ranges'):
-            self.add_governorate_lookup()
-        
-        try:
-            # Convert block_id to integer for range comparison
-            block_num = int(block_id.strip())
-            
-            # Check special blocks first
-            if block_num in self.special_blocks:
-                return self.special_blocks[block_num]
-            
-            # Check each governorate's ranges
-            for gov in self.governorate_ranges:
-                for start, end in gov["ranges"]:
-                    if start <= block_num <= end:
-                        return gov["name_en"], gov["name_ar"]
-                
-            return None, None
-            
-        except (ValueError, TypeError):
-            # If block_id is not a valid number
-            return None, None
+        """Get governorate names for a block ID using the precomputed block index"""
+        return lookup_governorate(block_id)
         
     def find_and_connect_reader(self):
         """Find and connect to the first available reader with a card"""
-        reader_list = readers()
+        reader_list = self.transport.readers()
         if not reader_list:
             print("No smart card readers found.")
             return False
@@ -161,106 +855,359 @@ class BahrainIDCard:
         print(f"Found {len(reader_list)} readers: {reader_list}")
         
         for reader in reader_list:
-            try:
-                connection = reader.createConnection()
-                connection.connect()
-                print(f"Connected to: {reader}")
-                self.connection = connection
-                
-                # Identify card type by ATR
-                atr = toHexString(connection.getATR()).replace(" ", "")
-                print(f"Card ATR: {atr}")
-                
-                if atr.startswith("3B670000A81041"):
-                    self.card_type = "V1"
-                elif atr.startswith("3B7A9600008065A2010101") or atr == "3B888001E1F35E1177":
-                    # Check for V2.1
-                    if self.check_v21_structure():
-                        self.card_type = "V2.1"
-                    else:
-                        self.card_type = "V2"
-                elif atr.startswith("3B7F"):
-                    self.card_type = "V4"
-                else:
-                    self.card_type = "Unknown"
-                
-                print(f"Identified card type: {self.card_type}")
+            if self.connect_reader(reader):
                 return True
                 
-            except (CardConnectionException, NoCardException):
-                print(f"No card in reader: {reader}")
-                continue
-                
         print("No card available in any reader.")
         return False
     
-    def check_v21_structure(self):
-        """Check if card has V2.1 structure"""
+    def connect_reader(self, reader):
+        """Connect to the card in a specific reader and identify its type"""
         try:
-            # Select CIO Applet
-            self.transmit(toBytes(self.apdu_commands["SELECT_MAIN_APPLET"]))
+            connection = reader.createConnection()
+            connection.connect()
+            print(f"Connected to: {reader}")
+            self.connection = connection
+            self.max_read_length = None
+            self.proven_read_length = 0
+            self.current_file = None
+            self.selected_path = []
+            self.needs_recovery = False
+            self.card_type = None
+            self.card_serial = None
+            self.serial_from_detection = False
+            if self.apdu_stats is not None:
+                self.apdu_stats.reset()
             
-            # Select MF
-            self.transmit(toBytes("00a40004023f00"))
+            # Identify card type by ATR
+            atr = toHexString(connection.getATR()).replace(" ", "")
+            self.atr = atr
+            print(f"Card ATR: {atr}")
             
-            # Select EF-DIR
-            response, sw1, sw2 = self.transmit(toBytes("00A40204022F00"))
+            self.card_type = self.detector.detect(self)
+            self.serial_from_detection = self.card_serial is not None
             
-            if (sw1 == 0x61 and sw2 == 0x15) or (sw1 == 0x90 and sw2 == 0x00):
-                # Read EF-DIR
-                data = self.read_binary_data(0, 335)
-                data_hex = binascii.hexlify(bytes(data)).decode('ascii')
-                
-                if "3F0001019F08020311" in data_hex or "3F0001019F0803030101" in data_hex:
-                    return True
-            return False
+            print(f"Identified card type: {self.card_type}")
+            return True
             
-        except Exception as e:
-            print(f"Error checking V2.1 structure: {e}")
+        except (CardConnectionException, NoCardException):
+            print(f"No card in reader: {reader}")
             return False
     
-    def transmit(self, command):
+    def check_v21_structure(self):
+        """Check if card has V2.1 structure"""
+        return self.detector.check_v21_structure(self)
+    
+    def send_command(self, name, level=None):
+        """
+        Send a named command from self.apdu_commands and return the response
+        
+        Args:
+            name (str): Command name
+            level (int): Position of a SELECT in selected_path, select_level(name) by default
+        """
+        if name in self.file_select_commands:
+            self.current_file = self.file_select_commands[name]
+        elif name.startswith("SELECT"):
+            self.current_file = None
+        if level is None and name.startswith("SELECT"):
+            level = self.select_level(name)
+        
+        command = self.encoded_commands[name]
+        attempt = 0
+        try:
+            while True:
+                try:
+                    if self.needs_recovery and not self.recovering:
+                        self.recover_connection()
+                    response, sw1, sw2 = self.transmit(command, name)
+                except CardConnectionException as e:
+                    # While recovering, recover_connection is retried as a whole instead
+                    if attempt >= self.max_retries or self.recovering:
+                        raise
+                    attempt += 1
+                    self.needs_recovery = True
+                    self.backoff(attempt, f"{name} failed ({e})")
+                    continue
+                if sw1 not in self.transient_sw1 or attempt >= self.max_retries:
+                    break
+                attempt += 1
+                self.backoff(attempt, f"{name} failed (status {sw1:02X}{sw2:02X})")
+        except Exception:
+            if level is not None:
+                # The select may or may not have reached the card
+                self.selected_path = self.selected_path[:level]
+            raise
+        
+        if level is not None:
+            # Only a select the card accepted is in effect, after a failed one
+            # nothing is known to be selected at this level
+            self.selected_path = self.selected_path[:level]
+            if sw1 in (0x90, 0x61) and len(self.selected_path) == level:
+                self.selected_path.append(name)
+        return response, sw1, sw2
+    
+    def select_level(self, name):
+        """
+        Return the default level of a SELECT in selected_path: 0 for applets and
+        the MF, 1 for directories, 2 for files. select_path places each select
+        relative to the path instead.
+        """
+        if name in self.file_select_commands:
+            return 2
+        if "_DIR" in name:
+            return 1
+        # Selecting the MF leaves the applet, like selecting another applet
+        return 0
+    
+    def select_path(self, path):
+        """
+        Select an applet, directory and file, skipping the selects already in effect.
+        The MF replaces the applet, so (applet, MF, EF-DIR) leaves [MF, EF-DIR]
+        in selected_path.
+        
+        Args:
+            path (tuple): Select command names, from the applet down
+            
+        Returns:
+            tuple: (command name, sw1, sw2) of the select that failed, or None
+        """
+        selection = []
+        for name in path:
+            # A root (applet or MF) starts a new selection, everything else is
+            # selected under the previous entry of the path
+            level = 0 if self.select_level(name) == 0 else len(selection)
+            selection = selection[:level] + [name]
+            if self.selected_path[:level + 1] == selection:
+                continue
+            response, sw1, sw2 = self.send_command(name, level)
+            if sw1 not in (0x90, 0x61):
+                return name, sw1, sw2
+        return None
+    
+    def backoff(self, attempt, message):
+        """Wait before retry number attempt, returning early if the read is cancelled"""
+        delay = self.retry_backoff * (2 ** (attempt - 1))
+        print(f"{message}, retry {attempt}/{self.max_retries} in {delay:.2f}s")
+        self.retries += 1
+        self.cancel_event.wait(delay)
+    
+    def recover_connection(self):
+        """
+        Reconnect after a lost connection or card reset, check that the card is the
+        one being read and select selected_path again.
+        
+        Raises CardConnectionException if that fails, needs_recovery stays set then,
+        and CardChangedError if the ATR or serial number differ.
+        """
+        self.needs_recovery = True
+        try:
+            try:
+                self.connection.reconnect()
+            except AttributeError:
+                # Connections without reconnect()
+                self.connection.disconnect()
+                self.connection.connect()
+        except NoCardException as e:
+            raise CardConnectionException(f"Reconnect failed: {e}")
+        
+        atr = toHexString(self.connection.getATR()).replace(" ", "")
+        if atr != self.atr:
+            raise CardChangedError(f"Card changed during the read (ATR {atr})")
+        
+        # The card was reset, nothing is selected any more
+        path = self.selected_path
+        self.selected_path = []
+        self.recovering = True
+        try:
+            if self.card_serial is not None:
+                self.select_path((self.read_plan()["applet"],))
+                serial = self.read_card_serial()
+                if serial is None:
+                    raise CardConnectionException("Could not read the card serial after reconnecting")
+                if serial != self.card_serial:
+                    raise CardChangedError(f"Card changed during the read (serial {serial})")
+            failed = self.select_path(path)
+            if failed:
+                name, sw1, sw2 = failed
+                raise CardConnectionException(f"Could not restore the selection, {name} returned {sw1:02X}{sw2:02X}")
+        except Exception:
+            # The next attempt selects the whole path again
+            self.selected_path = path
+            raise
+        finally:
+            self.recovering = False
+        self.recoveries += 1
+        self.needs_recovery = False
+    
+    def transmit(self, command, name=None):
         """Send command to card and return response"""
-        response, sw1, sw2 = self.connection.transmit(command)
+        if self.cancel_event.is_set():
+            raise ReadCancelledError("Card read cancelled")
+        
+        if not self.apdu_hooks and self.apdu_stats is None:
+            response, sw1, sw2 = self.connection.transmit(command)
+            return response, sw1, sw2
+        
+        start = time.perf_counter()
+        try:
+            response, sw1, sw2 = self.connection.transmit(command)
+        except Exception as e:
+            self.record_apdu(command, name, [], None, None, time.perf_counter() - start, str(e))
+            raise
+        self.record_apdu(command, name, response, sw1, sw2, time.perf_counter() - start)
         return response, sw1, sw2
     
+    def record_apdu(self, command, name, response, sw1, sw2, duration, error=None):
+        """Pass one APDU record to the instrumentation hooks"""
+        if name is None:
+            name = "READ_BINARY" if len(command) > 1 and command[1] == 0xB0 else "UNKNOWN"
+        record = {
+            "name": name,
+            "file": self.current_file,
+            "card_type": self.card_type,
+            "command_size": len(command),
+            "response_size": len(response),
+            "sw": None if sw1 is None else f"{sw1:02X}{sw2:02X}",
+            "duration": duration,
+            "error": error
+        }
+        if self.apdu_stats is not None:
+            self.apdu_stats.add(record)
+        for hook in self.apdu_hooks:
+            hook(record)
+    
+    def read_card_serial(self):
+        """Read the card serial number (main applet must be selected), None if unavailable"""
+        if self.card_type == "V1":
+            # V1 card serial number
+            response, sw1, sw2 = self.send_command("GET_SERIAL_V1")
+            if sw1 == 0x90:
+                return ''.join([chr(b) for b in response if b > 0 and b < 127]).strip()
+                
+        elif self.card_type in ["V2", "V2.1"]:
+            # V2/V2.1 card serial number
+            self.send_command("SELECT_V2_SERIAL_APPLET")
+            response, sw1, sw2 = self.send_command("GET_SERIAL_V2")
+            if sw1 == 0x90:
+                return ''.join([chr(b) for b in response if b > 0 and b < 127]).strip()
+                
+        elif self.card_type == "V4":
+            # V4 card serial number
+            response, sw1, sw2 = self.send_command("GET_SERIAL_V4")
+            if sw1 == 0x90:
+                return ''.join([chr(b) for b in response[3:11] if b > 0 and b < 127]).strip()
+        
+        return None
+    
     def get_low_high_bytes(self, offset):
         """Get low and high bytes for offset"""
         return [(offset & 0xFF), ((offset >> 8) & 0xFF)]
     
+    def build_read_command(self, offset, length):
+        """Build a READ BINARY command, using Le=0x00 or extended length above 255 bytes"""
+        p2, p1 = self.get_low_high_bytes(offset)
+        cla = 0x80 if self.card_type == "V1" else 0x00
+        
+        if length <= 255:
+            return [cla, 0xB0, p1, p2, length]
+        if length == 256:
+            # Short APDU, Le=0x00 asks for 256 bytes
+            return [cla, 0xB0, p1, p2, 0x00]
+        # Extended length APDU, Le is 0x00 followed by two length bytes
+        return [cla, 0xB0, p1, p2, 0x00, (length >> 8) & 0xFF, length & 0xFF]
+    
     def read_binary_data(self, offset, length):
-        """Read binary data from current file at offset"""
-        result = []
+        """
+        Read binary data from current file at offset.
+        
+        Reads use the largest chunk the card and reader accept. The first read at
+        each size longer than any that has succeeded is a probe: when it is rejected
+        with 6700/6Cxx or the transmit is refused, the chunk size steps down through
+        self.read_length_candidates (down to 255 bytes). Other failed chunks are
+        retried with backoff, reconnecting if needed, and the read resumes at the
+        failed offset.
+        
+        Returns:
+            bytearray: The data, filled in place and truncated if a read failed for
+            good, in which case self.last_read_error says why
+        """
+        result = bytearray(length)
+        filled = 0
         remaining = length
         current_offset = offset
+        attempt = 0
+        self.last_read_error = None
         
         while remaining > 0:
-            # Determine length to read (max 255)
-            read_length = min(255, remaining)
-            
-            # Get offset bytes in correct order for command
-            p2, p1 = self.get_low_high_bytes(current_offset)
+            # Determine length to read
+            chunk_limit = self.max_read_length or self.read_length_candidates[0]
+            read_length = min(chunk_limit, remaining)
+            probing = read_length > max(255, self.proven_read_length)
             
             # Create command based on card type
-            if self.card_type == "V1":
-                command = [0x80, 0xB0, p1, p2, read_length]
-            else:
-                command = [0x00, 0xB0, p1, p2, read_length]
-                
+            command = self.build_read_command(current_offset, read_length)
+            
             # Send command
-            response, sw1, sw2 = self.transmit(command)
+            error = None
+            transient = False
+            try:
+                if self.needs_recovery:
+                    self.recover_connection()
+                response, sw1, sw2 = self.transmit(command)
+            except CardConnectionException as e:
+                # Some readers refuse long APDUs outright instead of answering 6700
+                if probing and not self.needs_recovery:
+                    response, sw1, sw2 = [], 0x67, 0x00
+                else:
+                    response, sw1, sw2 = [], None, None
+                    error = str(e)
             
-            if sw1 != 0x90 or len(response) == 0:
-                print(f"Error reading binary data at offset {current_offset}, length {read_length}")
-                break
-                
-            # Append data
-            result.extend(response)
+            if error is None and (sw1 != 0x90 or len(response) == 0):
+                transient = sw1 in self.transient_sw1
+                if read_length > 255 and sw1 in (0x67, 0x6C):
+                    # Long read rejected for its length (or the transmit refused above),
+                    # fall back to the next smaller chunk size. Other status words are
+                    # ordinary read errors and leave the chunk size alone.
+                    smaller = [n for n in self.read_length_candidates + [self.proven_read_length]
+                               if n < read_length]
+                    self.max_read_length = max(smaller + [255])
+                    print(f"Read of {read_length} bytes not supported, using {self.max_read_length} byte chunks")
+                    continue
+                error = f"status {sw1:02X}{sw2:02X}"
+                if not transient and (sw1, sw2) not in ((0x69, 0x86), (0x6A, 0x82)):
+                    # E.g. end of file or offset outside the file, retrying will not help
+                    attempt = self.max_retries
             
-            # Update counters
-            current_offset += read_length
-            remaining -= read_length
+            if error is not None:
+                if attempt >= self.max_retries:
+                    print(f"Error reading binary data at offset {current_offset}, length {read_length}: {error}")
+                    self.last_read_error = error
+                    break
+                attempt += 1
+                if not transient:
+                    # Connection lost, or the selection is gone because the card was reset
+                    self.needs_recovery = True
+                self.backoff(attempt, f"Read at offset {current_offset} failed ({error})")
+                continue
+            attempt = 0
+            
+            # Reads of this size work, only longer ones need probing
+            if read_length > self.proven_read_length:
+                self.proven_read_length = read_length
             
+            # Copy data into place, the card may return fewer bytes than requested
+            received = min(len(response), remaining)
+            result[filled:filled + received] = response if received == len(response) else response[:received]
+            
+            # Update counters
+            filled += received
+            current_offset += received
+            remaining -= received
+        
+        # Drop the unread tail of a failed read
+        if filled < length:
+            del result[filled:]
         return result
     
     def extract_string(self, data, offset, length):
@@ -288,17 +1235,188 @@ class BahrainIDCard:
                 # Fall back to latin-1
                 return string_bytes.decode('latin-1', errors='ignore').strip()
     
-    def read_card_data(self, save_files=False, output_dir=None):
+    def resolve_files(self, files):
+        """Validate a file selection and return the set of files to read on this card"""
+        if files is None:
+            wanted = set(self.card_files)
+        else:
+            wanted = set(files)
+            unknown = wanted - set(self.card_files)
+            if unknown:
+                raise ValueError(f"Unknown card files: {', '.join(sorted(unknown))}")
+        
+        # Card information is part of the Personal Information file on V1 cards
+        if self.card_type == "V1" and "CardInfo" in wanted:
+            wanted.add("PersonalInfo")
+        return wanted
+    
+    def parse_card_file(self, file_name, data):
+        """Parse a raw card file and return the card data fields it holds"""
+        parsed = {}
+        if file_name == "PersonalInfo":
+            if self.card_type == "V1":
+                self.extract_personal_info_v1(data, parsed)
+            else:
+                self.extract_personal_info(data, parsed)
+        elif file_name == "CardInfo":
+            self.extract_card_info(data, parsed)
+        elif file_name == "AddressInfo" and self.card_type != "V1":
+            # No V1-specific address parser yet
+            self.extract_address_info(data, parsed)
+        elif file_name == "PhotoSignature":
+            # V1 files start with a 6 byte header
+            offset = 6 if self.card_type == "V1" else 0
+            view = memoryview(data)
+            parsed["photo_data"] = bytes(view[offset:offset + 4000])
+            parsed["signature_data"] = bytes(view[offset + 4000:offset + 6000])
+        return parsed
+    
+    def read_plan(self):
+        """Return the read plan for this card's type, the V2 plan for unknown types"""
+        return self.read_plans.get(self.card_type, self.read_plans["V2"])
+    
+    def iter_raw_files(self, files=None, select_applet=True):
+        """
+        Read card files one at a time, without parsing them.
+        
+        Files come in the order of the card's read plan (see READ_PLANS): PersonalInfo,
+        CardInfo, AddressInfo, PhotoSignature, EmploymentInfo, then the immigration
+        files. Selects already in effect are skipped. Files that could not be read
+        in full are listed in self.partial_files with the bytes read, the bytes
+        expected and the error.
+        
+        Args:
+            files (iterable): Names of the elementary files to read, None for all of them
+            select_applet (bool): Make sure the main applet is selected before reading
+            
+        Yields:
+            tuple: (file name, raw data, whether the data can be parsed), the data is
+            empty and not parseable when the file could not be selected
+        """
+        wanted = self.resolve_files(files)
+        self.partial_files = {}
+        plan = self.read_plan()
+        if select_applet:
+            self.select_path((plan["applet"],))
+        
+        for file_name, (path, length) in plan["files"].items():
+            if file_name not in wanted:
+                continue
+            
+            failed = self.select_path(path)
+            if failed:
+                # Reading now would return whichever file was selected before
+                command_name, sw1, sw2 = failed
+                self.partial_files[file_name] = {
+                    "read": 0,
+                    "expected": length,
+                    "error": f"{command_name} failed with status {sw1:02X}{sw2:02X}"
+                }
+                yield file_name, bytearray(), False
+                continue
+            
+            data = self.read_binary_data(0, length)
+            if self.last_read_error:
+                self.partial_files[file_name] = {
+                    "read": len(data),
+                    "expected": length,
+                    "error": self.last_read_error
+                }
+            yield file_name, data, True
+    
+    def iter_card_files(self, files=None, select_applet=True, pipelined=False, pipeline_depth=2):
+        """
+        Read card files one at a time, yielding each one as soon as it is read and parsed.
+        See iter_raw_files for the order and for self.partial_files.
+        
+        Args:
+            files (iterable): Names of the elementary files to read, None for all of them
+            select_applet (bool): Make sure the main applet is selected before reading
+            pipelined (bool): Read on a separate I/O thread that moves on to the next
+                file while this one is parsed and handled by the caller
+            pipeline_depth (int): Files the I/O thread may read ahead
+            
+        Yields:
+            tuple: (file name, raw data, dict of parsed card data fields)
+        """
+        if pipelined:
+            raw_files = self.iter_raw_files_pipelined(files, select_applet, pipeline_depth)
+        else:
+            raw_files = self.iter_raw_files(files, select_applet)
+        
+        for file_name, data, parseable in raw_files:
+            yield file_name, data, self.parse_card_file(file_name, data) if parseable else {}
+    
+    def iter_raw_files_pipelined(self, files=None, select_applet=True, depth=2):
+        """
+        Run iter_raw_files on an I/O thread and yield its files from a bounded queue.
+        
+        The I/O thread keeps sending APDUs for the next file while the caller works
+        on the previous one. Errors on the I/O thread are raised here, and closing
+        this generator early stops the I/O thread after its current file.
+        """
+        files_queue = queue.Queue(maxsize=depth)
+        stop = threading.Event()
+        done = object()
+        
+        def put(item):
+            while not stop.is_set():
+                try:
+                    files_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def read_files():
+            try:
+                for item in self.iter_raw_files(files, select_applet):
+                    if not put(item):
+                        return
+                put(done)
+            except BaseException as e:
+                put(e)
+        
+        io_thread = threading.Thread(target=read_files, name="bhcard-io", daemon=True)
+        io_thread.start()
+        try:
+            while True:
+                item = files_queue.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            io_thread.join()
+    
+    def read_card_data(self, save_files=False, output_dir=None, files=None, on_file=None, archive=None,
+                       pipelined=False):
         """
-        Read all data from the card. This is the common method used by both dump_card and get_card_data.
+        Read data from the card. This is the common method used by both dump_card and get_card_data.
         
         Args:
             save_files (bool): Whether to save files to disk
             output_dir (str): Directory to save files if save_files is True
+            files (iterable): Names of the elementary files to read (see self.card_files).
+                None reads every file. On V1 cards the card block lives in PersonalInfo,
+                so asking for CardInfo reads PersonalInfo instead.
+            on_file (callable): Called with (file name, raw data, parsed fields) as soon
+                as each file has been read, see iter_card_files
+            archive (CardArchiveWriter): Append the dump to this archive as one record,
+                see cardarchive.py
+            pipelined (bool): Read the card on an I/O thread while files already read
+                are parsed, saved and passed to on_file on this one
             
         Returns:
             dict: Card data
         """
+        requested = self.resolve_files(files)
+        archive_files = {}
+        self.retries = 0
+        self.recoveries = 0
+        
         try:
             # Initialize data dictionary
             card_data = {
@@ -317,405 +1435,189 @@ class BahrainIDCard:
             else:
                 print("\nReading card data...")
             
-            # Select main applet
-            self.transmit(toBytes(self.apdu_commands["SELECT_MAIN_APPLET"]))
+            # Select main applet, unless identifying the card left it selected
+            self.select_path((self.read_plan()["applet"],))
             
-            # --- Get card serial number ---
-            if self.card_type == "V1":
-                # V1 card serial number
-                response, sw1, sw2 = self.transmit(toBytes(self.apdu_commands["GET_SERIAL_V1"]))
-                if sw1 == 0x90:
-                    serial = ''.join([chr(b) for b in response if b > 0 and b < 127]).strip()
-                    card_data["card_serial"] = serial
-                    
-            elif self.card_type in ["V2", "V2.1"]:
-                # V2/V2.1 card serial number
-                self.transmit(toBytes(self.apdu_commands["SELECT_V2_SERIAL_APPLET"]))
-                response, sw1, sw2 = self.transmit(toBytes(self.apdu_commands["GET_SERIAL_V2"]))
-                if sw1 == 0x90:
-                    serial = ''.join([chr(b) for b in response if b > 0 and b < 127]).strip()
-                    card_data["card_serial"] = serial
-                    
-            elif self.card_type == "V4":
-                # V4 card serial number
-                response, sw1, sw2 = self.transmit(toBytes(self.apdu_commands["GET_SERIAL_V4"]))
-                if sw1 == 0x90:
-                    serial = ''.join([chr(b) for b in response[3:11] if b > 0 and b < 127]).strip()
-                    card_data["card_serial"] = serial
-            
-            # --- Personal and Card Information ---
-            if self.card_type == "V1":
-                # V1 cards use different directory structures
-                self.transmit(toBytes(self.apdu_commands["SELECT_CPR_DIR_V1"]))
-                
-                # Read Personal Information file
-                self.transmit(toBytes(self.apdu_commands["SELECT_PERSONAL_INFO_V1"]))
-                personal_info_data = self.read_binary_data(0, 610)
-                if save_files:
-                    self.save_file(output_dir, "PersonalInfo.bin", personal_info_data)
-                card_data["files"]["PersonalInfo"] = {
-                    "size": len(personal_info_data),
-                    "description": "Basic personal information (name, ID, etc.)"
-                }
-                self.extract_personal_info_v1(personal_info_data, card_data)
-                
-                # Read Photo and Signature file
-                self.transmit(toBytes(self.apdu_commands["SELECT_PHOTO_SIG_V1"]))
-                photo_sig_data = self.read_binary_data(0, 6006)
-                if save_files:
-                    self.save_file(output_dir, "PhotoSignature.bin", photo_sig_data)
-                    self.extract_photo_signature_v1(output_dir, photo_sig_data)
-                else:
-                    # Just store the data for later use
-                    card_data["photo_data"] = photo_sig_data[6:4006]
-                    card_data["signature_data"] = photo_sig_data[4006:6006]
-                
-                card_data["files"]["PhotoSignature"] = {
-                    "size": len(photo_sig_data),
-                    "description": "Photo and signature images"
-                }
-                
-                # Read Address Information file
-                self.transmit(toBytes(self.apdu_commands["SELECT_ADDRESS_V1"]))
-                address_data = self.read_binary_data(0, 711)
-                if save_files:
-                    self.save_file(output_dir, "AddressInfo.bin", address_data)
-                card_data["files"]["AddressInfo"] = {
-                    "size": len(address_data),
-                    "description": "Residential address and contact information"
-                }
-                # Extract address info (if implementing a V1-specific address parser)
-                
-                # Read Immigration files
-                self.transmit(toBytes(self.apdu_commands["SELECT_IMM_DIR_V1"]))
-                
-                # Immigration Basic Information
-                self.transmit(toBytes(self.apdu_commands["SELECT_IMM_BASIC_V1"]))
-                imm_basic_data = self.read_binary_data(0, 72)
-                if save_files:
-                    self.save_file(output_dir, "ImmigrationBasic.bin", imm_basic_data)
-                card_data["files"]["ImmigrationBasic"] = {
-                    "size": len(imm_basic_data),
-                    "description": "Basic immigration information"
-                }
-                
-                # Immigration Details Information
-                self.transmit(toBytes(self.apdu_commands["SELECT_IMM_DETAILS_V1"]))
-                imm_details_data = self.read_binary_data(0, 53)
-                if save_files:
-                    self.save_file(output_dir, "ImmigrationDetails.bin", imm_details_data)
-                card_data["files"]["ImmigrationDetails"] = {
-                    "size": len(imm_details_data),
-                    "description": "Detailed immigration status and information"
-                }
-                
-                # Immigration Additional Information
-                self.transmit(toBytes(self.apdu_commands["SELECT_IMM_ADDITIONAL_V1"]))
-                imm_additional_data = self.read_binary_data(0, 39)
-                if save_files:
-                    self.save_file(output_dir, "ImmigrationAdditional.bin", imm_additional_data)
-                card_data["files"]["ImmigrationAdditional"] = {
-                    "size": len(imm_additional_data),
-                    "description": "Additional immigration-related data"
-                }
-                
-            else:  # V2, V2.1, V4
-                # Select CPR Directory
-                self.transmit(toBytes(self.apdu_commands["SELECT_CPR_DIR_V2"]))
-                
-                # Read Personal Information file
-                self.transmit(toBytes(self.apdu_commands["SELECT_PERSONAL_INFO_V2"]))
-                personal_info_data = self.read_binary_data(0, 597)
-                if save_files:
-                    self.save_file(output_dir, "PersonalInfo.bin", personal_info_data)
-                card_data["files"]["PersonalInfo"] = {
-                    "size": len(personal_info_data),
-                    "description": "Basic personal information (name, ID, etc.)"
-                }
-                self.extract_personal_info(personal_info_data, card_data)
-                
-                # Read Card Information file
-                self.transmit(toBytes(self.apdu_commands["SELECT_CARD_INFO_V2"]))
-                card_info_data = self.read_binary_data(0, 36)
-                if save_files:
-                    self.save_file(output_dir, "CardInfo.bin", card_info_data)
-                card_data["files"]["CardInfo"] = {
-                    "size": len(card_info_data),
-                    "description": "Card issuance and expiry information"
-                }
-                self.extract_card_info(card_info_data, card_data)
-                
-                # Read Photo and Signature file
-                self.transmit(toBytes(self.apdu_commands["SELECT_PHOTO_SIG_V2"]))
-                photo_sig_data = self.read_binary_data(0, 6000)
-                if save_files:
-                    self.save_file(output_dir, "PhotoSignature.bin", photo_sig_data)
-                    self.extract_photo_signature(output_dir, photo_sig_data)
-                else:
-                    # Just store the data for later use
-                    card_data["photo_data"] = photo_sig_data[0:4000]
-                    card_data["signature_data"] = photo_sig_data[4000:6000]
-                
-                card_data["files"]["PhotoSignature"] = {
-                    "size": len(photo_sig_data),
-                    "description": "Photo and signature images"
-                }
-                
-                # Read Address Information file
-                self.transmit(toBytes(self.apdu_commands["SELECT_ADDRESS_V2"]))
-                address_data = self.read_binary_data(0, 512)
-                if save_files:
-                    self.save_file(output_dir, "AddressInfo.bin", address_data)
-                card_data["files"]["AddressInfo"] = {
-                    "size": len(address_data),
-                    "description": "Residential address and contact information"
-                }
-                self.extract_address_info(address_data, card_data, save_files, output_dir)
-                
-                # Read Employment Information file
-                self.transmit(toBytes(self.apdu_commands["SELECT_EMPLOYMENT_V2"]))
-                employment_data = self.read_binary_data(0, 1590)
-                if save_files:
-                    self.save_file(output_dir, "EmploymentInfo.bin", employment_data)
-                card_data["files"]["EmploymentInfo"] = {
-                    "size": len(employment_data),
-                    "description": "Employment and occupation details"
-                }
-                
-                # Read Immigration files
-                self.transmit(toBytes(self.apdu_commands["SELECT_IMM_DIR_V2"]))
-                
-                # Immigration Basic Information
-                self.transmit(toBytes(self.apdu_commands["SELECT_IMM_BASIC_V2"]))
-                imm_basic_data = self.read_binary_data(0, 6)
+            # --- Get card serial number, unless it was just read while identifying the card ---
+            # Later reads on the same connection read it again, the card may have been swapped
+            serial = self.card_serial if self.serial_from_detection else self.read_card_serial()
+            self.serial_from_detection = False
+            self.card_serial = serial
+            if serial is not None:
+                card_data["card_serial"] = serial
+            
+            # Return cached data for a card that was read recently
+            if self.cache is not None and not save_files and archive is None and serial:
+                cached = self.cache.get(self.atr, serial, requested)
+                if cached is not None:
+                    print(f"Card {serial} found in cache")
+                    cached["from_cache"] = True
+                    cached["dump_time"] = card_data["dump_time"]
+                    if self.apdu_stats is not None:
+                        cached["apdu_report"] = self.apdu_stats.report()
+                        self.apdu_stats.reset()
+                    return cached
+            
+            # --- Card files ---
+            for file_name, data, parsed in self.iter_card_files(requested, select_applet=False, pipelined=pipelined):
                 if save_files:
-                    self.save_file(output_dir, "ImmigrationBasic.bin", imm_basic_data)
-                card_data["files"]["ImmigrationBasic"] = {
-                    "size": len(imm_basic_data),
-                    "description": "Basic immigration information"
-                }
+                    self.save_file(output_dir, f"{file_name}.bin", data)
+                    if file_name == "PhotoSignature":
+                        if self.card_type == "V1":
+                            self.extract_photo_signature_v1(output_dir, data)
+                        else:
+                            self.extract_photo_signature(output_dir, data)
+                if archive is not None:
+                    archive_files[f"{file_name}.bin"] = data
                 
-                # Immigration Details Information
-                self.transmit(toBytes(self.apdu_commands["SELECT_IMM_DETAILS_V2"]))
-                imm_details_data = self.read_binary_data(0, 47)
-                if save_files:
-                    self.save_file(output_dir, "ImmigrationDetails.bin", imm_details_data)
-                card_data["files"]["ImmigrationDetails"] = {
-                    "size": len(imm_details_data),
-                    "description": "Detailed immigration status and information"
+                card_data["files"][file_name] = {
+                    "size": len(data),
+                    "description": self.file_descriptions[file_name]
                 }
+                if file_name in self.partial_files:
+                    card_data["files"][file_name]["partial"] = True
+                # Photo and signature are kept in memory as well so callers need not reload them
+                card_data.update(parsed)
                 
-                # Immigration Additional Information
-                self.transmit(toBytes(self.apdu_commands["SELECT_IMM_ADDITIONAL_V2"]))
-                imm_additional_data = self.read_binary_data(0, 33)
-                if save_files:
-                    self.save_file(output_dir, "ImmigrationAdditional.bin", imm_additional_data)
-                card_data["files"]["ImmigrationAdditional"] = {
-                    "size": len(imm_additional_data),
-                    "description": "Additional immigration-related data"
-                }
+                if on_file:
+                    on_file(file_name, data, parsed)
+            
+            # Report files that were cut short and how many APDUs had to be retried
+            if self.partial_files:
+                card_data["partial_files"] = dict(self.partial_files)
+                print(f"Warning: incomplete files {', '.join(self.partial_files)}")
+            if self.retries:
+                card_data["read_retries"] = self.retries
             
-            # Save metadata if requested
+            # Save metadata if requested, the images are already in their own files
             if save_files:
+                card_data["output_dir"] = output_dir
+                metadata = {k: v for k, v in card_data.items() if k not in ("photo_data", "signature_data")}
                 with open(os.path.join(output_dir, "metadata.json"), "w", encoding="utf-8") as f:
-                    json.dump(card_data, f, indent=2, ensure_ascii=False)
+                    json.dump(metadata, f, indent=2, ensure_ascii=False)
                 print(f"\nCard dump completed successfully. Files saved to {output_dir}")
             
+            # Append the whole dump to the archive in one write
+            if archive is not None:
+                photo_offset = 6 if self.card_type == "V1" else 0
+                aliases = {
+                    "photo.jpg": ("PhotoSignature.bin", photo_offset, 4000),
+                    "signature.jpg": ("PhotoSignature.bin", photo_offset + 4000, 2000)
+                }
+                card_data["archive_offset"] = archive.append(card_data, archive_files, aliases)
+                print(f"Card dump appended to {archive.path} at offset {card_data['archive_offset']}")
+            
+            # Remember the parsed data for the next time this card is presented, unless
+            # the read was cut short or had to reconnect to the card
+            if self.cache is not None and card_data.get("card_serial") and not self.partial_files \
+                    and not self.recoveries:
+                self.cache.put(self.atr, card_data["card_serial"], card_data, requested)
+            
+            # Attach the APDU report for this read and start a new one
+            if self.apdu_stats is not None:
+                card_data["apdu_report"] = self.apdu_stats.report()
+                self.apdu_stats.reset()
+            
             # Return the data
             return card_data
             
         except Exception as e:
+            # The read may have stopped between a select and its response
+            self.selected_path = []
             print(f"Error reading card data: {e}")
             return {"error": str(e)}
     
-    def dump_card(self):
+    def dump_card(self, output_dir=None, files=None, return_data=False, archive=None, pipelined=False):
         """
-        Dump all card data to files. This calls read_card_data with save_files=True.
+        Dump card data to files. This calls read_card_data with save_files=True, or
+        appends a single record to archive instead when one is given.
         
+        Args:
+            output_dir (str): Directory to save files, a timestamped one by default
+            files (iterable): Names of the elementary files to read, None for all of them
+            return_data (bool): Return the parsed card data from the same read
+                instead of a success flag
+            archive (CardArchiveWriter): Archive to append the dump to instead of a directory
+            pipelined (bool): Overlap card I/O with parsing and writing, see read_card_data
+            
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if successful, False otherwise, or
+            dict: Card data, including photo/signature bytes, when return_data is True
         """
-        result = self.read_card_data(save_files=True)
+        result = self.read_card_data(save_files=archive is None, output_dir=output_dir,
+                                     files=files, archive=archive, pipelined=pipelined)
+        if return_data:
+            return result
         return "error" not in result
     
-    def get_card_data(self):
+    def get_card_data(self, files=None):
         """
-        Get all card data as a dictionary. This calls read_card_data with save_files=False.
+        Get card data as a dictionary. This calls read_card_data with save_files=False.
         
+        Args:
+            files (iterable): Names of the elementary files to read, None for all of them
+            
         Returns:
             dict: Card data
         """
-        return self.read_card_data(save_files=False)
+        return self.read_card_data(save_files=False, files=files)
     
     def save_file(self, directory, filename, data):
         """Save data to a file"""
         filepath = os.path.join(directory, filename)
+        if isinstance(data, list):
+            data = bytes(data)
         with open(filepath, "wb") as f:
-            f.write(bytes(data))
+            f.write(data)
         print(f"Saved {filename} ({len(data)} bytes)")
     
     def extract_personal_info(self, data, card_data):
         """Extract personal information from Personal Information file"""
-        card_data["personal"] = {
-            "id_number": self.extract_string(data, 0, 9).zfill(9),
-            "first_name_en": self.extract_string(data, 9, 32),
-            "middle_name1_en": self.extract_string(data, 41, 32),
-            "middle_name2_en": self.extract_string(data, 73, 32),
-            "middle_name3_en": self.extract_string(data, 105, 32),
-            "middle_name4_en": self.extract_string(data, 137, 32),
-            "last_name_en": self.extract_string(data, 169, 32),
-            "first_name_ar": self.extract_utf8_string(data, 201, 64),
-            "middle_name1_ar": self.extract_utf8_string(data, 265, 64),
-            "middle_name2_ar": self.extract_utf8_string(data, 329, 64),
-            "middle_name3_ar": self.extract_utf8_string(data, 393, 64),
-            "middle_name4_ar": self.extract_utf8_string(data, 457, 64),
-            "last_name_ar": self.extract_utf8_string(data, 521, 64),
-            "gender": self.extract_string(data, 585, 1),
-            "blood_group": self.extract_string(data, 594, 3)
-        }
-        
-        # Format birth date
-        dob = self.extract_string(data, 586, 8)
-        if len(dob) == 8:
-            card_data["personal"]["birth_date"] = f"{dob[6:8]}/{dob[4:6]}/{dob[0:4]}"
-        else:
-            card_data["personal"]["birth_date"] = dob
-        
-        # Build full names
-        en_name_parts = [
-            card_data["personal"]["first_name_en"],
-            card_data["personal"]["middle_name1_en"],
-            card_data["personal"]["middle_name2_en"],
-            card_data["personal"]["middle_name3_en"],
-            card_data["personal"]["middle_name4_en"],
-            card_data["personal"]["last_name_en"]
-        ]
-        card_data["personal"]["full_name_en"] = ' '.join([p for p in en_name_parts if p])
-        
-        ar_name_parts = [
-            card_data["personal"]["first_name_ar"],
-            card_data["personal"]["middle_name1_ar"],
-            card_data["personal"]["middle_name2_ar"],
-            card_data["personal"]["middle_name3_ar"],
-            card_data["personal"]["middle_name4_ar"],
-            card_data["personal"]["last_name_ar"]
-        ]
-        card_data["personal"]["full_name_ar"] = ' '.join([p for p in ar_name_parts if p])
+        card_data["personal"] = PERSONAL_INFO_PARSER(data)
     
     def extract_personal_info_v1(self, data, card_data):
         """Extract personal information from Personal Information file (V1 cards)"""
-        card_data["personal"] = {
-            "id_number": self.extract_string(data, 8, 9).zfill(9),
-            "first_name_en": self.extract_string(data, 17, 32),
-            "middle_name1_en": self.extract_string(data, 49, 32),
-            "middle_name2_en": self.extract_string(data, 81, 32),
-            "middle_name3_en": self.extract_string(data, 113, 32),
-            "middle_name4_en": self.extract_string(data, 145, 32),
-            "last_name_en": self.extract_string(data, 177, 32),
-            "first_name_ar": self.extract_utf8_string(data, 209, 64),
-            "middle_name1_ar": self.extract_utf8_string(data, 273, 64),
-            "middle_name2_ar": self.extract_utf8_string(data, 337, 64),
-            "middle_name3_ar": self.extract_utf8_string(data, 401, 64),
-            "middle_name4_ar": self.extract_utf8_string(data, 465, 64),
-            "last_name_ar": self.extract_utf8_string(data, 529, 64),
-            "gender": self.extract_string(data, 593, 1),
-            "blood_group": self.extract_string(data, 594, 3)
-        }
+        card_data["personal"] = PERSONAL_INFO_PARSER_V1(data)
         
         # Card expiry date (for V1 it's in Personal Information file)
-        expiry = self.extract_string(data, 602, 8)
+        expiry = CARD_INFO_PARSER_V1(data)["expiry_date"]
         if len(expiry) == 8:
             card_data["card"] = {
-                "expiry_date": f"{expiry[6:8]}/{expiry[4:6]}/{expiry[0:4]}"
+                "expiry_date": format_card_date(expiry)
             }
-        
-        # Format birth date
-        dob = self.extract_string(data, 594, 8)
-        if len(dob) == 8:
-            card_data["personal"]["birth_date"] = f"{dob[6:8]}/{dob[4:6]}/{dob[0:4]}"
-        else:
-            card_data["personal"]["birth_date"] = dob
-        
-        # Build full names
-        en_name_parts = [
-            card_data["personal"]["first_name_en"],
-            card_data["personal"]["middle_name1_en"],
-            card_data["personal"]["middle_name2_en"],
-            card_data["personal"]["middle_name3_en"],
-            card_data["personal"]["middle_name4_en"],
-            card_data["personal"]["last_name_en"]
-        ]
-        card_data["personal"]["full_name_en"] = ' '.join([p for p in en_name_parts if p])
-        
-        ar_name_parts = [
-            card_data["personal"]["first_name_ar"],
-            card_data["personal"]["middle_name1_ar"],
-            card_data["personal"]["middle_name2_ar"],
-            card_data["personal"]["middle_name3_ar"],
-            card_data["personal"]["middle_name4_ar"],
-            card_data["personal"]["last_name_ar"]
-        ]
-        card_data["personal"]["full_name_ar"] = ' '.join([p for p in ar_name_parts if p])
     
     def extract_card_info(self, data, card_data):
         """Extract card information from Card Information file"""
-        card_data["card"] = {}
-        
-        # Card expiry date
-        expiry = self.extract_string(data, 0, 8)
-        if len(expiry) == 8:
-            card_data["card"]["expiry_date"] = f"{expiry[6:8]}/{expiry[4:6]}/{expiry[0:4]}"
-        else:
-            card_data["card"]["expiry_date"] = expiry
-            
-        # Card issue date
-        issue = self.extract_string(data, 8, 8)
-        if len(issue) == 8:
-            card_data["card"]["issue_date"] = f"{issue[6:8]}/{issue[4:6]}/{issue[0:4]}"
-        else:
-            card_data["card"]["issue_date"] = issue
-            
-        card_data["card"]["issuing_authority"] = self.extract_string(data, 16, 20)
+        card_data["card"] = CARD_INFO_PARSER(data)
     
     def extract_photo_signature(self, output_dir, data):
         """Extract photo and signature from Photo and Signature file"""
+        view = memoryview(data)
+        
         # Extract photo (first 4000 bytes)
-        photo_data = data[0:4000]
+        photo_data = view[0:4000]
         self.save_file(output_dir, "photo.jpg", photo_data)
         
         # Extract signature (next 2000 bytes)
-        signature_data = data[4000:6000]
+        signature_data = view[4000:6000]
         self.save_file(output_dir, "signature.jpg", signature_data)
     
     def extract_photo_signature_v1(self, output_dir, data):
         """Extract photo and signature from Photo and Signature file (V1 cards)"""
+        view = memoryview(data)
+        
         # Extract photo (first 4000 bytes after offset 6)
-        photo_data = data[6:4006]
+        photo_data = view[6:4006]
         self.save_file(output_dir, "photo.jpg", photo_data)
         
         # Extract signature (next 2000 bytes)
-        signature_data = data[4006:6006]
+        signature_data = view[4006:6006]
         self.save_file(output_dir, "signature.jpg", signature_data)
     
-    def extract_address_info(self, address_data, card_data, save_files=False, output_dir=None):
+    def extract_address_info(self, address_data, card_data):
         """Extract address information from Address Information file"""
         # Parse the address data using the exact offsets from the C# code
-        card_data["address"] = {
-            "email": self.extract_utf8_string(address_data, 0, 64),
-            "contact_no": self.extract_utf8_string(address_data, 64, 12),
-            "residence_no": self.extract_utf8_string(address_data, 76, 12),
-            "flat_no": self.extract_utf8_string(address_data, 105, 4),
-            "building_no": self.extract_utf8_string(address_data, 109, 4),
-            "building_alpha": self.extract_utf8_string(address_data, 113, 1),
-            "building_alpha_arabic": self.extract_utf8_string(address_data, 114, 2),
-            "road_no": self.extract_utf8_string(address_data, 116, 4),
-            "road_name": self.extract_utf8_string(address_data, 120, 64),
-            "road_name_arabic": self.extract_utf8_string(address_data, 184, 128),
-            "block_no": self.extract_utf8_string(address_data, 312, 4),
-            "block_name": self.extract_utf8_string(address_data, 316, 64),
-            "block_name_arabic": self.extract_utf8_string(address_data, 380, 128),
-            "governorate_no": self.extract_utf8_string(address_data, 508, 4)
-        }
+        card_data["address"] = ADDRESS_INFO_PARSER(address_data)
         
         # Add governorate information if block number exists
         block_id = card_data["address"]["block_no"].strip()
@@ -729,9 +1631,159 @@ class BahrainIDCard:
         """Disconnect from the card"""
         if self.connection:
             self.connection.disconnect()
+            self.connection = None
             print("Disconnected from card.")
 
 
+def read_all_readers(transport=None, files=None, save_files=False, max_workers=None):
+    """
+    Read the cards in all attached readers concurrently, one worker thread per reader.
+    
+    Args:
+        transport: Reader transport shared by the workers, defaults to PC/SC
+        files (iterable): Names of the elementary files to read, None for all of them
+        save_files (bool): Whether to dump each card to its own directory
+        max_workers (int): Limit on concurrent readers, defaults to one per reader
+        
+    Yields:
+        tuple: (reader name, card data) for every reader, in completion order.
+            Readers without a card yield {"error": ...} as card data.
+    """
+    transport = transport or PCSCTransport()
+    reader_list = transport.readers()
+    if not reader_list:
+        print("No smart card readers found.")
+        return
+    
+    def read_reader(index, reader):
+        card = BahrainIDCard(transport=transport)
+        try:
+            if not card.connect_reader(reader):
+                return {"error": "No card in reader"}
+            output_dir = None
+            if save_files:
+                output_dir = f"bahrain_id_dump_{time.strftime('%Y%m%d_%H%M%S')}_reader{index}"
+            return card.read_card_data(save_files=save_files, output_dir=output_dir, files=files)
+        finally:
+            if card.connection:
+                card.disconnect()
+    
+    with ThreadPoolExecutor(max_workers=max_workers or len(reader_list)) as executor:
+        futures = {
+            executor.submit(read_reader, index, reader): str(reader)
+            for index, reader in enumerate(reader_list)
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], {"error": str(e)}
+
+
+class CardReadMonitor(CardObserver):
+    """
+    Read every card as soon as it is inserted, driven by card insertion events.
+    
+    The transport's card monitor keeps its PC/SC context alive between cards and one
+    BahrainIDCard is kept per reader, so nothing is enumerated or rebuilt per card.
+    Each result is passed to callback(reader_name, card_data) or, without a callback,
+    put on the results queue as (reader_name, card_data). card_data["read_seconds"]
+    is the time from the insertion event to the end of the read.
+    
+    With save_files every card is dumped to its own directory under dump_root, with
+    an archive (CardArchiveWriter) every card is appended to it instead.
+    
+    Usage:
+        monitor = CardReadMonitor(callback=handle_card)
+        monitor.start()
+        ...
+        monitor.stop()
+    """
+    
+    def __init__(self, callback=None, results=None, transport=None, files=None,
+                 save_files=False, on_remove=None, max_workers=8, archive=None, dump_root=None,
+                 pipelined=False):
+        self.callback = callback
+        self.results = results if results is not None else queue.Queue()
+        self.transport = transport or PCSCTransport()
+        self.files = files
+        self.save_files = save_files
+        self.on_remove = on_remove
+        self.max_workers = max_workers
+        self.archive = archive
+        self.dump_root = dump_root
+        self.pipelined = pipelined
+        self.cards = {}
+        # One read at a time per reader, a card can be reinserted before its last read ends
+        self.reader_locks = {}
+        self.lock = threading.Lock()
+        self.executor = None
+        # Numbers the dump directories, several cards can be read within one second
+        self.dump_count = itertools.count(1)
+    
+    def start(self):
+        """Start listening for card events; cards already inserted are read right away"""
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.transport.add_observer(self)
+    
+    def stop(self):
+        """Stop listening and wait for reads in progress to finish"""
+        self.transport.delete_observer(self)
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+    
+    def update(self, observable, actions):
+        """Called by the card monitor with (added cards, removed cards)"""
+        added_cards, removed_cards = actions
+        for card in removed_cards:
+            if self.on_remove:
+                self.on_remove(str(card.reader))
+        for card in added_cards:
+            if self.executor:
+                self.executor.submit(self.read_card, card, time.perf_counter())
+    
+    def read_card(self, card, inserted=None):
+        """Read an inserted card and deliver the result"""
+        reader_name = str(card.reader)
+        with self.lock:
+            reader_lock = self.reader_locks.setdefault(reader_name, threading.Lock())
+        with reader_lock:
+            card_data = self.read_reader(card, reader_name, inserted)
+        
+        if self.callback:
+            self.callback(reader_name, card_data)
+        else:
+            self.results.put((reader_name, card_data))
+    
+    def read_reader(self, card, reader_name, inserted):
+        """Read the card with the reader's BahrainIDCard, the reader's lock must be held"""
+        bhcard = self.cards.get(reader_name)
+        if bhcard is None:
+            bhcard = self.cards[reader_name] = BahrainIDCard(transport=self.transport)
+        
+        output_dir = None
+        if self.save_files and self.archive is None:
+            output_dir = os.path.join(self.dump_root or ".",
+                                      f"bahrain_id_dump_{time.strftime('%Y%m%d_%H%M%S')}_{next(self.dump_count):05d}")
+        
+        start = inserted if inserted is not None else time.perf_counter()
+        try:
+            if bhcard.connect_reader(card):
+                card_data = bhcard.read_card_data(save_files=output_dir is not None, output_dir=output_dir,
+                                                  files=self.files, archive=self.archive,
+                                                  pipelined=self.pipelined)
+            else:
+                card_data = {"error": "Failed to connect to card"}
+        except Exception as e:
+            card_data = {"error": str(e)}
+        finally:
+            if bhcard.connection:
+                bhcard.disconnect()
+        card_data["read_seconds"] = time.perf_counter() - start
+        return card_data
+
+
 def main():
     print("="*50)
     print("Bahrain ID Card Dumper")
@@ -740,13 +1792,9 @@ def main():
     bhcard = BahrainIDCard()
     
     if bhcard.find_and_connect_reader():
-        # Example 1: Dump all card data to files
-        print("\nExample 1: Dump all card data to files")
-        bhcard.dump_card()
-        
-        # Example 2: Get card data as a dictionary
-        print("\nExample 2: Get card data as a dictionary")
-        card_data = bhcard.get_card_data()
+        # Dump all card data to files and get the parsed data from the same read
+        print("\nDumping all card data to files")
+        card_data = bhcard.dump_card(return_data=True)
         
         # Print some information from the card data
         if "personal" in card_data:
@@ -0,0 +1,115 @@
+"""
+asyncio interface for reading Bahrain ID cards.
+
+pyscard calls block, so every AsyncBahrainIDCard runs its card I/O on its own
+single-thread executor. Reads on different readers can then be awaited
+concurrently without blocking the event loop:
+
+    results = await AsyncBahrainIDCard.read_all(timeout=10)
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from bhcard import BahrainIDCard, PCSCTransport
+
+
+class AsyncBahrainIDCard:
+    """
+    Awaitable wrapper around a BahrainIDCard bound to one reader.
+    
+    Args:
+        reader: Reader to use, or None for the first reader with a card
+        transport: Reader transport, defaults to PC/SC
+        cache (CardDataCache): Optional cache passed to BahrainIDCard
+    """
+    
+    def __init__(self, reader=None, transport=None, cache=None):
+        self.reader = reader
+        self.card = BahrainIDCard(transport=transport, cache=cache)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bhcard-io")
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def run(self, func, *args, timeout=None):
+        """
+        Run a blocking call on this card's executor.
+        
+        On timeout or cancellation the card's cancel_event is set, so the blocking
+        call stops at its next APDU instead of holding the reader.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, self._run_blocking, func, args)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            self.card.cancel_event.set()
+            raise
+    
+    def _run_blocking(self, func, args):
+        # Runs on the executor thread, after any cancelled call has finished
+        self.card.cancel_event.clear()
+        return func(*args)
+    
+    async def connect(self, timeout=None):
+        """Connect to the reader's card, returns True on success"""
+        if self.reader is None:
+            return await self.run(self.card.find_and_connect_reader, timeout=timeout)
+        return await self.run(self.card.connect_reader, self.reader, timeout=timeout)
+    
+    async def read(self, files=None, save_files=False, output_dir=None, timeout=None):
+        """
+        Connect if needed and read the card.
+        
+        Args:
+            files (iterable): Names of the elementary files to read, None for all of them
+            save_files (bool): Whether to save files to disk
+            output_dir (str): Directory to save files if save_files is True
+            timeout (float): Seconds before asyncio.TimeoutError is raised
+            
+        Returns:
+            dict: Card data, or {"error": ...} if no card could be connected
+        """
+        return await self.run(self._read, files, save_files, output_dir, timeout=timeout)
+    
+    def _read(self, files, save_files, output_dir):
+        if self.card.connection is None:
+            connected = (self.card.find_and_connect_reader() if self.reader is None
+                         else self.card.connect_reader(self.reader))
+            if not connected:
+                return {"error": "Failed to connect to a card reader with a valid card"}
+        return self.card.read_card_data(save_files=save_files, output_dir=output_dir, files=files)
+    
+    async def disconnect(self):
+        """Disconnect from the card"""
+        await self.run(self.card.disconnect)
+    
+    async def close(self):
+        """Disconnect and release the executor thread"""
+        try:
+            await self.disconnect()
+        finally:
+            self.executor.shutdown(wait=False)
+    
+    @classmethod
+    async def read_all(cls, transport=None, files=None, timeout=None):
+        """
+        Read the cards in all readers concurrently.
+        
+        Returns:
+            list: (reader name, card data) per reader; failed or timed out reads
+                have {"error": ...} as card data
+        """
+        transport = transport or PCSCTransport()
+        reader_list = transport.readers()
+        
+        async def read_one(reader):
+            async with cls(reader, transport=transport) as card:
+                try:
+                    return str(reader), await card.read(files=files, timeout=timeout)
+                except asyncio.TimeoutError:
+                    return str(reader), {"error": "Timed out reading card"}
+        
+        return await asyncio.gather(*(read_one(reader) for reader in reader_list))
@@ -0,0 +1,358 @@
+"""
+Local HTTP/JSON service for reading Bahrain ID cards.
+
+One process owns the readers. Every reader gets a session with its own worker
+thread and request queue, so concurrent clients are served one at a time per
+reader while different readers work in parallel. A session stays connected to
+its card between requests; it reconnects only when the card monitor reports an
+insertion or removal in its reader, or when a read fails.
+
+    python bhcard_service.py --port 8765
+
+Endpoints (localhost only by default):
+
+    GET /health                         readers, queue lengths and counters
+    GET /read                           all card files
+    GET /read/PersonalInfo,CardInfo     only the listed card files
+
+/read accepts reader=<name or index> to choose a reader, the first reader with a
+card is used otherwise, and images=1 to include the photo and signature as base64.
+"""
+import argparse
+import base64
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+from smartcard.CardMonitoring import CardObserver
+from bhcard import BahrainIDCard, CardDataCache, PCSCTransport
+
+DEFAULT_PORT = 8765
+
+
+class ServiceError(Exception):
+    """Request failure reported to the client with an HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ReaderSession:
+    """
+    A BahrainIDCard bound to one reader, serving read requests from a queue.
+
+    Args:
+        reader: Reader providing createConnection()
+        transport: Transport the reader belongs to
+        cache (CardDataCache): Optional cache shared between sessions
+        max_queue (int): Requests allowed to wait for this reader
+    """
+
+    def __init__(self, reader, transport, cache=None, max_queue=32):
+        self.reader = reader
+        self.name = str(reader)
+        self.card = BahrainIDCard(transport=transport, cache=cache)
+        self.requests = queue.Queue(maxsize=max_queue)
+        # Set by the card monitor when a card is inserted or removed
+        self.card_changed = threading.Event()
+        self.stats = {"reads": 0, "errors": 0, "connects": 0, "seconds": 0.0}
+        self.busy = False
+        self.thread = threading.Thread(target=self.run, name=f"reader-{self.name}", daemon=True)
+        self.thread.start()
+
+    def submit(self, files=None):
+        """
+        Queue a read of files (None for all of them).
+
+        Returns:
+            Future: Resolves to the card data
+
+        Raises:
+            ServiceError: If the reader's queue is full
+        """
+        future = Future()
+        try:
+            self.requests.put_nowait((future, files))
+        except queue.Full:
+            raise ServiceError(503, f"Too many requests queued for reader {self.name}")
+        return future
+
+    def stop(self):
+        self.requests.put(None)
+
+    def run(self):
+        while True:
+            job = self.requests.get()
+            if job is None:
+                break
+            future, files = job
+            # Requests that timed out while queued were cancelled by the client
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.busy = True
+            self.card.cancel_event.clear()
+            start = time.perf_counter()
+            try:
+                future.set_result(self.read(files))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self.busy = False
+                self.stats["seconds"] += time.perf_counter() - start
+
+        if self.card.connection:
+            self.card.disconnect()
+
+    def connect(self):
+        """(Re)connect to the card in the reader, returns True on success"""
+        self.card_changed.clear()
+        if self.card.connection:
+            self.card.disconnect()
+        self.stats["connects"] += 1
+        return self.card.connect_reader(self.reader)
+
+    def read(self, files):
+        """Read the card, reconnecting first if it changed and once more if the read fails"""
+        reconnected = False
+        if self.card.connection is None or self.card_changed.is_set():
+            if not self.connect():
+                raise ServiceError(503, f"No card in reader {self.name}")
+            reconnected = True
+
+        card_data = self.card.read_card_data(files=files)
+        if "error" in card_data and not reconnected and not self.card.cancel_event.is_set():
+            if not self.connect():
+                raise ServiceError(503, f"No card in reader {self.name}")
+            card_data = self.card.read_card_data(files=files)
+
+        self.stats["reads"] += 1
+        if "error" in card_data:
+            self.stats["errors"] += 1
+            # Start over with a fresh connection next time
+            self.card.disconnect()
+        return card_data
+
+    def status(self):
+        return {
+            "reader": self.name,
+            "connected": self.card.connection is not None,
+            "card_type": self.card.card_type if self.card.connection else None,
+            "busy": self.busy,
+            "queued": self.requests.qsize(),
+            "reads": self.stats["reads"],
+            "errors": self.stats["errors"],
+            "connects": self.stats["connects"],
+            "avg_read_ms": round(self.stats["seconds"] * 1000 / self.stats["reads"], 1) if self.stats["reads"] else None
+        }
+
+
+class ReaderPool(CardObserver):
+    """
+    Reader sessions for every reader of a transport.
+
+    The pool registers with the transport's card monitor, so sessions learn about
+    card changes without polling the card. Readers attached later are picked up
+    when a request names them or on refresh().
+    """
+
+    def __init__(self, transport=None, cache=None, max_queue=32):
+        self.transport = transport or PCSCTransport()
+        self.cache = cache
+        self.max_queue = max_queue
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.refresh()
+        self.transport.add_observer(self)
+
+    def refresh(self):
+        """Add sessions for readers that were attached since the last refresh"""
+        with self.lock:
+            for reader in self.transport.readers():
+                if str(reader) not in self.sessions:
+                    self.sessions[str(reader)] = ReaderSession(reader, self.transport, self.cache, self.max_queue)
+            return list(self.sessions.values())
+
+    def update(self, observable, actions):
+        """Called by the card monitor with (added cards, removed cards)"""
+        added_cards, removed_cards = actions
+        for card in list(added_cards) + list(removed_cards):
+            session = self.sessions.get(str(card.reader))
+            if session:
+                session.card_changed.set()
+
+    def session(self, reader):
+        """Find a session by reader name or index"""
+        sessions = list(self.sessions.values())
+        if reader.isdigit() and int(reader) < len(sessions):
+            return sessions[int(reader)]
+        if reader not in self.sessions:
+            self.refresh()
+        if reader not in self.sessions:
+            raise ServiceError(404, f"Unknown reader: {reader}")
+        return self.sessions[reader]
+
+    def read(self, files=None, reader=None, timeout=30):
+        """
+        Read a card through the reader queues.
+
+        Without a reader the readers are tried in order until one holds a card.
+
+        Returns:
+            tuple: (reader name, card data)
+        """
+        if reader is not None:
+            sessions = [self.session(reader)]
+        else:
+            sessions = list(self.sessions.values()) or self.refresh()
+        if not sessions:
+            raise ServiceError(503, "No smart card readers found")
+
+        # Readers that already hold a connected card first
+        sessions.sort(key=lambda session: session.card.connection is None)
+        deadline = time.monotonic() + timeout
+        error = None
+        for session in sessions:
+            future = session.submit(files)
+            try:
+                return session.name, future.result(max(0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                if not future.cancel():
+                    session.card.cancel_event.set()
+                raise ServiceError(504, f"Timed out waiting for reader {session.name}")
+            except ServiceError as e:
+                error = e
+        if len(sessions) > 1 and error.status == 503:
+            error = ServiceError(503, "No card in any reader")
+        raise error
+
+    def status(self):
+        return [session.status() for session in self.sessions.values()]
+
+    def close(self):
+        self.transport.delete_observer(self)
+        for session in self.sessions.values():
+            session.stop()
+        for session in self.sessions.values():
+            session.thread.join(timeout=5)
+
+
+def card_data_to_json(card_data, images=False):
+    """Make card data JSON-serializable; image bytes are dropped or base64-encoded"""
+    result = {}
+    for key, value in card_data.items():
+        if key in CardDataCache.binary_fields:
+            if images:
+                result[key] = base64.b64encode(bytes(value)).decode("ascii")
+        else:
+            result[key] = value
+    return result
+
+
+class CardRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler; the pool and settings are attributes of the server"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        path = url.path.rstrip("/")
+        try:
+            if path == "/health":
+                self.send_json(200, {"status": "ok", "uptime": round(time.time() - self.server.started, 1),
+                                     "readers": self.server.pool.status()})
+            elif path == "/read" or path.startswith("/read/"):
+                self.handle_read(path[len("/read/"):] if path.startswith("/read/") else "", params)
+            else:
+                raise ServiceError(404, f"Unknown endpoint: {url.path}")
+        except ServiceError as e:
+            self.send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+    def handle_read(self, file_list, params):
+        files = None
+        if file_list:
+            files = [name for name in unquote(file_list).split(",") if name]
+            unknown = set(files) - set(self.server.card_files)
+            if unknown:
+                raise ServiceError(400, f"Unknown card files: {', '.join(sorted(unknown))}")
+
+        reader = params.get("reader", [None])[0]
+        images = params.get("images", ["0"])[0] in ("1", "true", "yes")
+        reader_name, card_data = self.server.pool.read(files, reader, self.server.read_timeout)
+        card_data = card_data_to_json(card_data, images)
+        card_data["reader"] = reader_name
+        self.send_json(500 if "error" in card_data else 200, card_data)
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class CardServer(ThreadingHTTPServer):
+    """Threading HTTP server with a listen backlog sized for bursts of local clients"""
+
+    daemon_threads = True
+    request_queue_size = 64
+
+
+def create_server(host="127.0.0.1", port=DEFAULT_PORT, transport=None, cache=None, max_queue=32,
+                  read_timeout=30, quiet=False):
+    """
+    Create the HTTP server and its reader pool. Call serve_forever() to run it and
+    server_close() followed by server.pool.close() to stop.
+
+    Args:
+        host (str): Address to bind, localhost by default
+        port (int): Port to listen on, 0 for any free port
+        transport: Reader transport, defaults to PC/SC
+        cache (CardDataCache): Optional cache of parsed card data
+        max_queue (int): Requests allowed to wait per reader
+        read_timeout (float): Seconds a request may wait for its read
+        quiet (bool): Whether to suppress the per-request log lines
+    """
+    server = CardServer((host, port), CardRequestHandler)
+    server.pool = ReaderPool(transport, cache, max_queue)
+    server.card_files = BahrainIDCard(transport=server.pool.transport).card_files
+    server.read_timeout = read_timeout
+    server.quiet = quiet
+    server.started = time.time()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Bahrain ID card reads over local HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument("--max-queue", type=int, default=32, help="requests allowed to wait per reader")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds a request may wait for its read")
+    parser.add_argument("--cache-ttl", type=float, default=0, help="serve repeat reads of a card from a cache for this many seconds")
+    parser.add_argument("--quiet", action="store_true", help="do not log every request")
+    args = parser.parse_args()
+
+    cache = CardDataCache(ttl=args.cache_ttl) if args.cache_ttl > 0 else None
+    server = create_server(args.host, args.port, cache=cache, max_queue=args.max_queue,
+                           read_timeout=args.timeout, quiet=args.quiet)
+    print(f"Serving card reads on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Compact card dump archives.
+
+An archive is an append-only segment file holding one record per card dump. A
+record is written with a single buffered write:
+
+    magic  b"BHCR"
+    uint32 header length (big-endian)
+    uint32 blob length (big-endian)
+    header JSON: {"card_data": ..., "files": {name: [offset, length], ...}}
+    blob:  the raw card files, back to back
+
+File offsets are relative to the start of the blob. photo.jpg and signature.jpg
+point into PhotoSignature.bin instead of being stored twice. A single-card
+archive is simply a segment with one record.
+
+A record cut short by a crash or power loss during append can only be the last
+one. Iteration stops there with a warning and the reader's truncated_at is set
+to its offset; the records before it stay readable.
+
+    writer = CardArchiveWriter("cards.bhca")
+    bhcard.dump_card(archive=writer)
+
+    for record in CardArchiveReader("cards.bhca"):
+        print(record["offset"], record["card_data"]["card_serial"])
+"""
+import json
+import os
+import struct
+import sys
+import threading
+
+MAGIC = b"BHCR"
+RECORD_HEADER = struct.Struct(">4sII")
+
+# Card data fields that hold raw bytes and are kept as files instead of JSON
+BINARY_FIELDS = ("photo_data", "signature_data")
+
+
+class TruncatedRecordError(ValueError):
+    """Raised for a record that extends past the end of the archive file"""
+
+
+class CardArchiveWriter:
+    """Append card dumps to an archive segment file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def append(self, card_data, files, aliases=None):
+        """
+        Append one card dump as a single record.
+
+        Args:
+            card_data (dict): Parsed card data; image bytes are left out of the header
+            files (dict): File name -> raw bytes
+            aliases (dict): File name -> (source file name, offset, length) for files
+                stored as ranges of another file
+
+        Returns:
+            int: Offset of the record in the archive
+        """
+        file_index = {}
+        blob_parts = []
+        blob_length = 0
+        for name, data in files.items():
+            file_index[name] = [blob_length, len(data)]
+            blob_parts.append(data)
+            blob_length += len(data)
+
+        for name, (source, offset, length) in (aliases or {}).items():
+            if source in file_index:
+                start, size = file_index[source]
+                file_index[name] = [start + offset, max(0, min(length, size - offset))]
+
+        header = json.dumps({
+            "card_data": {k: v for k, v in card_data.items() if k not in BINARY_FIELDS},
+            "files": file_index
+        }, ensure_ascii=False).encode("utf-8")
+
+        record = b"".join([RECORD_HEADER.pack(MAGIC, len(header), blob_length), header] + blob_parts)
+
+        with self.lock:
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(record)
+        return offset
+
+
+class CardArchiveReader:
+    """Read records from an archive segment file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.truncated_at = None
+
+    def __iter__(self):
+        """
+        Yield every record's header as {"offset", "card_data", "files"}, without
+        loading file data. A truncated last record ends the iteration with a warning.
+        """
+        self.truncated_at = None
+        with open(self.path, "rb") as f:
+            while True:
+                offset = f.tell()
+                try:
+                    record = self._read_header(f, offset)
+                except TruncatedRecordError as e:
+                    self.truncated_at = offset
+                    print(f"Warning: {e}, ignoring the rest of the archive", file=sys.stderr)
+                    return
+                if record is None:
+                    return
+                f.seek(record["blob_offset"] + record["blob_length"])
+                yield record
+
+    def _read_header(self, f, offset):
+        prefix = f.read(RECORD_HEADER.size)
+        if not prefix:
+            return None
+        if len(prefix) < RECORD_HEADER.size:
+            raise TruncatedRecordError(f"Truncated record at offset {offset} in {self.path}")
+
+        magic, header_length, blob_length = RECORD_HEADER.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"Bad record magic at offset {offset} in {self.path}")
+
+        # The whole record must be in the file before its header is trusted
+        blob_offset = offset + RECORD_HEADER.size + header_length
+        if blob_offset + blob_length > os.fstat(f.fileno()).st_size:
+            raise TruncatedRecordError(f"Truncated record at offset {offset} in {self.path}")
+
+        header = json.loads(f.read(header_length).decode("utf-8"))
+        return {
+            "offset": offset,
+            "card_data": header["card_data"],
+            "files": header["files"],
+            "blob_offset": blob_offset,
+            "blob_length": blob_length
+        }
+
+    def index(self):
+        """Map each card serial to the offsets of its records, oldest first"""
+        index = {}
+        for record in self:
+            serial = record["card_data"].get("card_serial")
+            index.setdefault(serial, []).append(record["offset"])
+        return index
+
+    def read(self, offset):
+        """
+        Read a complete record.
+
+        Returns:
+            tuple: (card data with photo_data/signature_data restored, dict of file name -> bytes)
+        """
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            record = self._read_header(f, offset)
+            if record is None:
+                raise ValueError(f"No record at offset {offset} in {self.path}")
+            blob = f.read(record["blob_length"])
+
+        view = memoryview(blob)
+        files = {name: bytes(view[start:start + length]) for name, (start, length) in record["files"].items()}
+
+        card_data = dict(record["card_data"])
+        if "photo.jpg" in files:
+            card_data["photo_data"] = files["photo.jpg"]
+        if "signature.jpg" in files:
+            card_data["signature_data"] = files["signature.jpg"]
+        return card_data, files
+
+    def read_file(self, offset, name):
+        """Read a single file of a record"""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            record = self._read_header(f, offset)
+            start, length = record["files"][name]
+            f.seek(record["blob_offset"] + start)
+            return f.read(length)
+
+    def latest(self, serial):
+        """Return the newest record for a card serial as read() does, or None"""
+        offsets = self.index().get(serial)
+        if not offsets:
+            return None
+        return self.read(offsets[-1])
+
+
+def archive_size(path):
+    """Return the size of an archive file in bytes, 0 if it does not exist"""
+    return os.path.getsize(path) if os.path.exists(path) else 0
@@ -0,0 +1,169 @@
+"""
+Mass enrollment: read card after card without restarting anything.
+
+The readers are watched by a CardReadMonitor, so one PC/SC context and one
+BahrainIDCard per reader serve the whole session. Every inserted card is read
+once, persisted to an archive (or a dump directory per card), and the operator
+is told to remove it. After every card a live report line shows throughput in
+cards/min, latency percentiles and failure counts:
+
+    python enroll.py --archive drive.bhca
+    python enroll.py --dump-root dumps/ --parallel
+
+Press Ctrl+C to stop; a summary is printed on exit.
+"""
+import argparse
+import threading
+import time
+from bhcard import CardReadMonitor, PCSCTransport, percentile
+from cardarchive import CardArchiveWriter
+
+
+class EnrollmentStats:
+    """Thread-safe counters and latencies of an enrollment session"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.failures = {}
+        self.serials = set()
+        self.cards = 0
+        self.partial = 0
+        self.duplicates = 0
+        self.first_insert = None
+        self.last_done = None
+
+    def add(self, card_data):
+        """Record one read, returns True if it succeeded"""
+        now = time.perf_counter()
+        seconds = card_data.get("read_seconds", 0.0)
+        with self.lock:
+            if self.first_insert is None:
+                self.first_insert = now - seconds
+            self.last_done = now
+            if "error" in card_data:
+                self.failures[card_data["error"]] = self.failures.get(card_data["error"], 0) + 1
+                return False
+
+            self.cards += 1
+            self.latencies.append(seconds)
+            if card_data.get("partial_files"):
+                self.partial += 1
+            serial = card_data.get("card_serial")
+            if serial in self.serials:
+                self.duplicates += 1
+            elif serial:
+                self.serials.add(serial)
+            return True
+
+    def report(self):
+        """Return a dict with cards, cards_per_min, p50/p90/p99 latency in ms and failure counts"""
+        with self.lock:
+            elapsed = (self.last_done - self.first_insert) if self.cards else 0.0
+            return {
+                "cards": self.cards,
+                "cards_per_min": self.cards * 60 / elapsed if elapsed > 0 else 0.0,
+                "p50_ms": percentile(self.latencies, 0.5) * 1000,
+                "p90_ms": percentile(self.latencies, 0.9) * 1000,
+                "p99_ms": percentile(self.latencies, 0.99) * 1000,
+                "failures": sum(self.failures.values()),
+                "failure_reasons": dict(self.failures),
+                "partial": self.partial,
+                "duplicates": self.duplicates
+            }
+
+    @staticmethod
+    def format_report(report):
+        """Format a report() dict as a single status line"""
+        return (f"{report['cards']} cards, {report['cards_per_min']:.1f} cards/min, "
+                f"p50 {report['p50_ms']:.0f} ms, p90 {report['p90_ms']:.0f} ms, p99 {report['p99_ms']:.0f} ms, "
+                f"{report['failures']} failed, {report['partial']} partial, {report['duplicates']} duplicates")
+
+
+class Enrollment:
+    """
+    Continuous batch reading of inserted cards.
+
+    Args:
+        transport: Reader transport, defaults to PC/SC
+        archive (CardArchiveWriter): Archive every card is appended to
+        dump_root (str): Directory for one dump directory per card, used without an archive
+        files (iterable): Names of the card files to read, None for all of them
+        parallel (bool): Read cards in different readers at the same time instead of one by one
+        pipelined (bool): Overlap card I/O with parsing and saving, see read_card_data
+        bell (bool): Ring the terminal bell when a card can be removed
+        on_card (callable): Called with (reader name, card data) after each card is reported
+    """
+
+    def __init__(self, transport=None, archive=None, dump_root=None, files=None, parallel=False,
+                 pipelined=False, bell=False, on_card=None):
+        self.transport = transport or PCSCTransport()
+        self.stats = EnrollmentStats()
+        self.bell = bell
+        self.on_card = on_card
+        max_workers = max(1, len(self.transport.readers())) if parallel else 1
+        self.monitor = CardReadMonitor(callback=self.handle_card, transport=self.transport, files=files,
+                                       save_files=archive is None, on_remove=self.handle_remove,
+                                       max_workers=max_workers, archive=archive, dump_root=dump_root,
+                                       pipelined=pipelined)
+
+    def start(self):
+        """Start reading cards as they are inserted"""
+        print("Insert cards to enroll them. Press Ctrl+C to stop.")
+        self.monitor.start()
+
+    def stop(self):
+        """Stop reading, wait for reads in progress and return the final report"""
+        self.monitor.stop()
+        return self.stats.report()
+
+    def handle_card(self, reader_name, card_data):
+        """Record a read and tell the operator to remove the card"""
+        ok = self.stats.add(card_data)
+        if ok:
+            personal = card_data.get("personal", {})
+            result = f"{personal.get('id_number', card_data.get('card_serial', '?'))} " \
+                     f"{personal.get('full_name_en', '')}".rstrip()
+            if card_data.get("partial_files"):
+                result += f" (incomplete: {', '.join(card_data['partial_files'])})"
+        else:
+            result = f"FAILED: {card_data['error']}"
+
+        bell = "\a" if self.bell else ""
+        print(f"{bell}[{reader_name}] {result} in {card_data.get('read_seconds', 0) * 1000:.0f} ms - remove card")
+        print(f"  {EnrollmentStats.format_report(self.stats.report())}")
+        if self.on_card:
+            self.on_card(reader_name, card_data)
+
+    def handle_remove(self, reader_name):
+        print(f"[{reader_name}] Card removed, ready for the next card")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read Bahrain ID cards continuously for mass enrollment")
+    parser.add_argument("--archive", help="append every card to this archive file (*.bhca)")
+    parser.add_argument("--dump-root", default=".", help="directory for per-card dump directories when no archive is given")
+    parser.add_argument("--files", nargs="*", help="only read these card files")
+    parser.add_argument("--parallel", action="store_true", help="read cards in all readers at the same time")
+    parser.add_argument("--pipelined", action="store_true", help="overlap card I/O with parsing and saving")
+    parser.add_argument("--bell", action="store_true", help="ring the terminal bell when a card can be removed")
+    args = parser.parse_args()
+
+    archive = CardArchiveWriter(args.archive) if args.archive else None
+    enrollment = Enrollment(archive=archive, dump_root=args.dump_root, files=args.files,
+                            parallel=args.parallel, pipelined=args.pipelined, bell=args.bell)
+    enrollment.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        report = enrollment.stop()
+        print(f"\nEnrollment finished: {EnrollmentStats.format_report(report)}")
+        for reason, count in report["failure_reasons"].items():
+            print(f"  {count} x {reason}")
+
+
+if __name__ == "__main__":
+    main()
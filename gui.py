@@ -2,14 +2,18 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
 import json
-from PIL import Image, ImageTk
 import threading
-import io
-from bhcard import BahrainIDCard  # Import the new BahrainIDCard class
+import queue
+from bhcard import BahrainIDCard, CardReadMonitor  # Import the new BahrainIDCard class
+from thumbnails import ThumbnailLoader, PHOTO_SIZE, SIGNATURE_SIZE
+from arabic_text import shape_arabic, preload as preload_arabic_text
 
-# Libraries for proper Arabic text display
-import arabic_reshaper
-from bidi.algorithm import get_display
+# PIL and the Arabic shaping libraries (arabic_reshaper, python-bidi) are imported
+# where they are first needed so the window comes up without loading them. The
+# shaping libraries are loaded in the background once the first read starts.
+
+# How often the Tk main loop applies updates posted by worker threads
+UI_POLL_MS = 30
 
 class BahrainIDViewer(tk.Tk):
     def __init__(self):
@@ -20,6 +24,18 @@ class BahrainIDViewer(tk.Tk):
         
         self.card = BahrainIDCard()  # Use the new class
         self.card_data = None
+        self.monitor = None
+        
+        # Photo and signature thumbnails, decoded in the background and cached
+        self.thumbnails = ThumbnailLoader()
+        self.thumbnail_keys = {}
+        
+        # Worker threads never touch Tk directly, they post updates to this queue
+        self.ui_updates = queue.Queue()
+        self.read_lock = threading.Lock()
+        
+        # Set once the Arabic shaping has been preloaded, see start_arabic_preload
+        self.arabic_preloaded = False
         
         # Create main frame
         main_frame = ttk.Frame(self, padding=10)
@@ -36,6 +52,12 @@ class BahrainIDViewer(tk.Tk):
         self.dump_button = ttk.Button(button_frame, text="Dump Data", command=self.dump_data)
         self.dump_button.pack(side=tk.LEFT, padx=5)
         
+        # Read cards automatically as soon as they are inserted
+        self.auto_read_var = tk.BooleanVar(value=False)
+        self.auto_read_check = ttk.Checkbutton(button_frame, text="Auto Read", variable=self.auto_read_var,
+                                               command=self.toggle_auto_read)
+        self.auto_read_check.pack(side=tk.LEFT, padx=5)
+        
         # Add status bar
         self.status_var = tk.StringVar()
         self.status_var.set("Ready")
@@ -249,111 +271,188 @@ class BahrainIDViewer(tk.Tk):
         
         self.result_text = tk.Text(result_frame, wrap=tk.WORD, height=10)
         self.result_text.pack(fill=tk.BOTH, expand=True)
+        
+        self.after(UI_POLL_MS, self.process_ui_updates)
     
     def format_arabic_text(self, text):
         """Format Arabic text properly for display with proper shaping and direction"""
-        if not text or text == "N/A":
-            return text
-            
+        return shape_arabic(text)
+    
+    def post_ui(self, **changes):
+        """
+        Queue UI changes from any thread, they are applied by process_ui_updates.
+        
+        Args:
+            card_data (dict): Card data to show
+            status (str): Status bar text
+            result_text (str): Raw data text
+            dump_info (tuple): (output directory, dump time, file list)
+            error (str): Message for an error dialog
+            thumbnail (tuple): (kind, key, image or exception) of a decoded thumbnail
+        """
+        self.ui_updates.put(changes)
+    
+    def process_ui_updates(self):
+        """Apply all queued UI changes as one update, on the Tk thread"""
+        merged = {}
+        errors = []
+        thumbnails = []
         try:
-            # Reshape the Arabic text to connect the letters properly
-            reshaped_text = arabic_reshaper.reshape(text)
-            # Apply bidirectional algorithm to handle right-to-left text
-            bidi_text = get_display(reshaped_text)
-            return bidi_text
-        except Exception as e:
-            print(f"Error formatting Arabic text: {e}")
-            return text
+            while True:
+                changes = self.ui_updates.get_nowait()
+                if "error" in changes:
+                    errors.append(changes.pop("error"))
+                if "thumbnail" in changes:
+                    thumbnails.append(changes.pop("thumbnail"))
+                merged.update(changes)
+        except queue.Empty:
+            pass
+        
+        try:
+            if "card_data" in merged:
+                self.card_data = merged["card_data"]
+                self.update_ui_with_card_data()
+            if "dump_info" in merged:
+                output_dir, dump_time, files_list = merged["dump_info"]
+                self.dump_dir_label.config(text=output_dir)
+                self.dump_time_label.config(text=dump_time)
+                self.files_label.config(text=files_list)
+            if "result_text" in merged:
+                self.update_result_text(merged["result_text"])
+            if "status" in merged:
+                self.status_var.set(merged["status"])
+            for thumbnail in thumbnails:
+                self._set_thumbnail(*thumbnail)
+            for error in errors:
+                messagebox.showerror("Error", error)
+        finally:
+            self.after(UI_POLL_MS, self.process_ui_updates)
+    
+    def start_arabic_preload(self):
+        """Shape the governorate names in the background while the first card is read"""
+        if not self.arabic_preloaded:
+            self.arabic_preloaded = True
+            threading.Thread(target=preload_arabic_text, daemon=True).start()
     
     def read_card(self):
         """Read card information using BahrainIDCard"""
+        self.start_card_thread(self._read_card_thread)
+    
+    def start_card_thread(self, target):
+        """Run target in a worker thread unless a read or dump is already running"""
+        if not self.read_lock.acquire(blocking=False):
+            self.status_var.set("A card read is already in progress")
+            return
         self.status_var.set("Connecting to card reader...")
-        self.update_idletasks()
+        self.start_arabic_preload()
+        
+        def run():
+            try:
+                target()
+            finally:
+                self.read_lock.release()
         
         # Start in a separate thread to avoid freezing UI
-        threading.Thread(target=self._read_card_thread, daemon=True).start()
+        threading.Thread(target=run, daemon=True).start()
     
     def _read_card_thread(self):
         """Thread function for reading card"""
         try:
             if self.card.find_and_connect_reader():
-                self.status_var.set("Connected! Reading card data...")
-                self.update_idletasks()
+                self.post_ui(status="Connected! Reading card data...")
+                
+                # Show each file as soon as it has been read, the photo takes longest
+                partial = {"card_type": self.card.card_type}
                 
-                # Use the get_card_data method to retrieve all card data
-                self.card_data = self.card.get_card_data()
+                def on_file(file_name, data, parsed):
+                    partial.update(parsed)
+                    self.post_ui(card_data=dict(partial), status=f"Read {file_name}...")
                 
-                # Update UI with card data
-                self.after(100, self.update_ui_with_card_data)
+                card_data = self.card.read_card_data(on_file=on_file)
+                if "error" in card_data:
+                    error_msg = f"Error reading card: {card_data['error']}"
+                    self.post_ui(status=error_msg, result_text=error_msg, error=error_msg)
+                    return
                 
-                # Show the data in the text area
-                self.after(100, lambda: self.update_result_text(json.dumps(self.card_data, indent=2, ensure_ascii=False)))
-                self.after(100, lambda: self.status_var.set("Card read successfully"))
+                self.post_ui(card_data=card_data, result_text=self.format_card_json(card_data),
+                             status="Card read successfully")
             else:
-                self.after(100, lambda: self.status_var.set("Failed to connect to a card reader"))
-                self.after(100, lambda: messagebox.showerror("Error", "Failed to connect to a card reader with a valid card"))
+                self.post_ui(status="Failed to connect to a card reader",
+                             error="Failed to connect to a card reader with a valid card")
         except Exception as e:
             error_msg = f"Error reading card: {str(e)}"
-            self.after(100, lambda: self.status_var.set(error_msg))
-            self.after(100, lambda: messagebox.showerror("Error", error_msg))
-            self.after(100, lambda: self.update_result_text(error_msg))
+            self.post_ui(status=error_msg, result_text=error_msg, error=error_msg)
         finally:
             # Make sure to disconnect
             if hasattr(self.card, 'connection') and self.card.connection:
                 self.card.disconnect()
     
+    def toggle_auto_read(self):
+        """Start or stop reading cards on insertion"""
+        if self.auto_read_var.get():
+            if self.read_lock.locked():
+                # The monitor would read the same reader as the manual read
+                self.auto_read_var.set(False)
+                self.status_var.set("Wait for the current read to finish before turning on Auto Read")
+                return
+            # Manual reads would share the readers with the monitor
+            self.read_button.state(["disabled"])
+            self.dump_button.state(["disabled"])
+            self.monitor = CardReadMonitor(callback=self._on_card_read, on_remove=self._on_card_removed)
+            self.monitor.start()
+            self.start_arabic_preload()
+            self.status_var.set("Waiting for a card...")
+        elif self.monitor:
+            self.monitor.stop()
+            self.monitor = None
+            self.read_button.state(["!disabled"])
+            self.dump_button.state(["!disabled"])
+            self.status_var.set("Ready")
+    
+    def _on_card_read(self, reader_name, card_data):
+        """Monitor callback for a card read on insertion"""
+        if "error" in card_data:
+            error_msg = f"Error reading card in {reader_name}: {card_data['error']}"
+            self.post_ui(status=error_msg, result_text=error_msg)
+            return
+        
+        self.post_ui(card_data=card_data, result_text=self.format_card_json(card_data),
+                     status=f"Card read from {reader_name}")
+    
+    def _on_card_removed(self, reader_name):
+        """Monitor callback for a removed card"""
+        self.post_ui(status="Waiting for a card...")
+    
     def dump_data(self):
         """Dump all card data to files using BahrainIDCard"""
-        self.status_var.set("Connecting to card reader...")
-        self.update_idletasks()
-        
-        # Start in a separate thread to avoid freezing UI
-        threading.Thread(target=self._dump_data_thread, daemon=True).start()
+        self.start_card_thread(self._dump_data_thread)
     
     def _dump_data_thread(self):
         """Thread function for dumping data"""
         try:
             if self.card.find_and_connect_reader():
-                self.status_var.set("Connected! Dumping all card data...")
-                self.update_idletasks()
+                self.post_ui(status="Connected! Dumping all card data...")
                 
-                # Dump all data to files
-                result = self.card.dump_card()
+                # Dump all data to files, keeping the parsed data and images from the same read
+                result = self.card.dump_card(return_data=True)
                 
-                if result:
-                    # Get the dump directory
-                    self.card_data = self.card.read_card_data(save_files=False)
-                    
-                    # Update UI with data
-                    self.after(100, self.update_ui_with_card_data)
-                    
-                    # Update dump information
-                    if hasattr(self.card, 'output_dir') and self.card.output_dir:
-                        self.after(100, lambda: self.dump_dir_label.config(text=self.card.output_dir))
-                        self.after(100, lambda: self.dump_time_label.config(text=self.card_data.get("dump_time", "Unknown")))
-                        
-                        files_list = ", ".join(self.card_data.get("files", {}).keys())
-                        self.after(100, lambda: self.files_label.config(text=files_list))
-                        
-                        # Load photos if available
-                        self.after(100, lambda: self.load_images_from_files(self.card.output_dir))
-                    
-                    # Display raw data in text area
-                    self.after(100, lambda: self.update_result_text(json.dumps(self.card_data, indent=2, ensure_ascii=False)))
-                    
-                    # Update status
-                    self.after(100, lambda: self.status_var.set(f"Data dumped successfully to {self.card.output_dir}"))
+                if "error" not in result:
+                    output_dir = result.get("output_dir", "")
+                    files_list = ", ".join(result.get("files", {}).keys())
+                    self.post_ui(
+                        card_data=result,
+                        dump_info=(output_dir, result.get("dump_time", "Unknown"), files_list),
+                        result_text=self.format_card_json(result),
+                        status=f"Data dumped successfully to {output_dir}"
+                    )
                 else:
-                    self.after(100, lambda: self.status_var.set("Failed to dump card data"))
-                    self.after(100, lambda: messagebox.showerror("Error", "Failed to dump card data"))
+                    self.post_ui(status="Failed to dump card data", error="Failed to dump card data")
             else:
-                self.after(100, lambda: self.status_var.set("Failed to connect to a card reader"))
-                self.after(100, lambda: messagebox.showerror("Error", "Failed to connect to a card reader with a valid card"))
+                self.post_ui(status="Failed to connect to a card reader",
+                             error="Failed to connect to a card reader with a valid card")
         except Exception as e:
             error_msg = f"Error dumping card: {str(e)}"
-            self.after(100, lambda: self.status_var.set(error_msg))
-            self.after(100, lambda: messagebox.showerror("Error", error_msg))
-            self.after(100, lambda: self.update_result_text(error_msg))
+            self.post_ui(status=error_msg, result_text=error_msg, error=error_msg)
         finally:
             # Make sure to disconnect
             if hasattr(self.card, 'connection') and self.card.connection:
@@ -425,63 +524,66 @@ class BahrainIDViewer(tk.Tk):
             )
     
     def load_images_from_memory(self, photo_data, signature_data):
-        """Load photo and signature from memory data"""
-        try:
-            # Load photo
-            photo = Image.open(io.BytesIO(bytes(photo_data)))
-            photo = photo.resize((150, 200), Image.LANCZOS)
-            photo_tk = ImageTk.PhotoImage(photo)
-            
-            # Store reference to prevent garbage collection
-            self.photo_image = photo_tk
-            self.photo_label.config(image=photo_tk, text="")
-            
-            # Load signature
-            signature = Image.open(io.BytesIO(bytes(signature_data)))
-            signature = signature.resize((200, 100), Image.LANCZOS)
-            signature_tk = ImageTk.PhotoImage(signature)
-            
-            # Store reference to prevent garbage collection
-            self.signature_image = signature_tk
-            self.signature_label.config(image=signature_tk, text="")
-            
-        except Exception as e:
-            print(f"Error loading images from memory: {e}")
-            self.photo_label.config(text="Error loading photo")
-            self.signature_label.config(text="Error loading signature")
+        """Show photo and signature from memory data, decoding them off the UI thread"""
+        self.show_thumbnail("photo", photo_data, PHOTO_SIZE)
+        self.show_thumbnail("signature", signature_data, SIGNATURE_SIZE)
     
     def load_images_from_files(self, directory):
         """Load photo and signature from files in the dump directory"""
         if not directory:
             return
-            
-        try:
-            # Load photo
-            photo_path = os.path.join(directory, "photo.jpg")
-            if os.path.exists(photo_path):
-                photo = Image.open(photo_path)
-                photo = photo.resize((150, 200), Image.LANCZOS)
-                photo_tk = ImageTk.PhotoImage(photo)
-                
-                # Store reference to prevent garbage collection
-                self.photo_image = photo_tk
-                self.photo_label.config(image=photo_tk, text="")
-            
-            # Load signature
-            signature_path = os.path.join(directory, "signature.jpg")
-            if os.path.exists(signature_path):
-                signature = Image.open(signature_path)
-                signature = signature.resize((200, 100), Image.LANCZOS)
-                signature_tk = ImageTk.PhotoImage(signature)
-                
-                # Store reference to prevent garbage collection
-                self.signature_image = signature_tk
-                self.signature_label.config(image=signature_tk, text="")
-                
-        except Exception as e:
-            print(f"Error loading images from files: {e}")
-            self.photo_label.config(text="Error loading photo")
-            self.signature_label.config(text="Error loading signature")
+        
+        for kind, size in (("photo", PHOTO_SIZE), ("signature", SIGNATURE_SIZE)):
+            path = os.path.join(directory, f"{kind}.jpg")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    self.show_thumbnail(kind, f.read(), size)
+    
+    def show_thumbnail(self, kind, data, size):
+        """
+        Show a photo or signature thumbnail. Cached thumbnails are shown at once,
+        others are decoded by self.thumbnails and shown when ready.
+        
+        Args:
+            kind (str): "photo" or "signature"
+            data (bytes): Encoded image
+            size (tuple): Thumbnail size
+        """
+        def on_decoded(key, result):
+            self.post_ui(thumbnail=(kind, key, result))
+        
+        key, image = self.thumbnails.load(data, size, on_decoded)
+        if key == self.thumbnail_keys.get(kind):
+            return
+        self.thumbnail_keys[kind] = key
+        if image is not None:
+            self._set_thumbnail(kind, key, image)
+    
+    def _set_thumbnail(self, kind, key, image):
+        """Put a decoded thumbnail into its label, on the Tk thread"""
+        # A newer card may have been shown while this one was decoding
+        if key != self.thumbnail_keys.get(kind):
+            return
+        
+        label = self.photo_label if kind == "photo" else self.signature_label
+        if isinstance(image, Exception):
+            print(f"Error loading {kind}: {image}")
+            label.config(text=f"Error loading {kind}")
+            return
+        
+        from PIL import ImageTk
+        image_tk = ImageTk.PhotoImage(image)
+        # Store reference to prevent garbage collection
+        setattr(self, f"{kind}_image", image_tk)
+        label.config(image=image_tk, text="")
+    
+    def format_card_json(self, card_data):
+        """Format card data as JSON for the text area, summarizing the image bytes"""
+        shown = dict(card_data)
+        for key in ("photo_data", "signature_data"):
+            if key in shown:
+                shown[key] = f"<{len(shown[key])} bytes>"
+        return json.dumps(shown, indent=2, ensure_ascii=False)
     
     def update_result_text(self, text):
         """Update the result text area"""
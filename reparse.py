@@ -0,0 +1,158 @@
+"""
+Re-parse stored card dumps without the card.
+
+Takes dump directories written by BahrainIDCard.dump_card (raw .bin files plus
+metadata.json) or archive files (*.bhca, see cardarchive.py), runs the current
+parsers over them in a process pool and streams one JSON object per dump as
+JSON Lines:
+
+    python reparse.py dumps/ cards.bhca --workers 8 --output parsed.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from bhcard import BahrainIDCard
+from cardarchive import CardArchiveReader
+
+# One parser instance per worker process
+_card = None
+
+
+ARCHIVE_EXTENSION = ".bhca"
+
+
+def find_dump_dirs(paths):
+    """
+    Yield every dump under paths: directories that hold a metadata.json, and
+    (archive path, record offset, error) tuples for each record of a *.bhca archive
+    """
+    for path in paths:
+        if path.endswith(ARCHIVE_EXTENSION) and os.path.isfile(path):
+            yield from find_archive_records(path)
+            continue
+        if os.path.isfile(os.path.join(path, "metadata.json")):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            if "metadata.json" in files:
+                yield root
+            for name in sorted(files):
+                if name.endswith(ARCHIVE_EXTENSION):
+                    yield from find_archive_records(os.path.join(root, name))
+
+
+def find_archive_records(path):
+    """
+    Yield (path, offset, None) for every record in an archive, and (path, offset,
+    error message) for a truncated tail or an archive that cannot be read further
+    """
+    reader = CardArchiveReader(path)
+    offset = 0
+    try:
+        for record in reader:
+            yield (path, record["offset"], None)
+            offset = record["blob_offset"] + record["blob_length"]
+    except Exception as e:
+        yield (path, offset, f"Cannot read archive: {e}")
+        return
+    if reader.truncated_at is not None:
+        yield (path, reader.truncated_at, "Truncated record, probably from an interrupted append")
+
+
+def parse_dump_dir(dump_dir):
+    """
+    Parse the raw files of one dump directory, or of one archive record given
+    as (archive path, offset, error) by find_archive_records, with the current parsers.
+
+    Returns:
+        dict: Card data without the image bytes, or {"dump_dir": ..., "error": ...}
+    """
+    global _card
+    if _card is None:
+        _card = BahrainIDCard()
+
+    try:
+        if isinstance(dump_dir, tuple):
+            archive_path, offset, error = dump_dir
+            dump_dir = f"{archive_path}@{offset}"
+            if error:
+                return {"dump_dir": dump_dir, "error": error}
+            metadata, raw_files = CardArchiveReader(archive_path).read(offset)
+        else:
+            with open(os.path.join(dump_dir, "metadata.json"), "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            raw_files = None
+
+        _card.card_type = metadata.get("card_type")
+        card_data = {
+            "dump_dir": dump_dir,
+            "card_type": _card.card_type,
+            "card_serial": metadata.get("card_serial"),
+            "dump_time": metadata.get("dump_time"),
+            "files": {}
+        }
+
+        for file_name in _card.card_files:
+            if raw_files is not None:
+                data = raw_files.get(f"{file_name}.bin")
+                if data is None:
+                    continue
+            else:
+                path = os.path.join(dump_dir, f"{file_name}.bin")
+                if not os.path.exists(path):
+                    continue
+                with open(path, "rb") as f:
+                    data = f.read()
+            card_data["files"][file_name] = {
+                "size": len(data),
+                "description": _card.file_descriptions[file_name]
+            }
+            parsed = _card.parse_card_file(file_name, data)
+            parsed.pop("photo_data", None)
+            parsed.pop("signature_data", None)
+            card_data.update(parsed)
+
+        return card_data
+
+    except Exception as e:
+        return {"dump_dir": str(dump_dir), "error": str(e)}
+
+
+def reparse(paths, output, workers=None, chunksize=16):
+    """
+    Parse all dumps under paths in a process pool and write JSON Lines to output.
+
+    Returns:
+        tuple: (number of dumps parsed, number of failures)
+    """
+    count = failures = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for card_data in executor.map(parse_dump_dir, find_dump_dirs(paths), chunksize=chunksize):
+            output.write(json.dumps(card_data, ensure_ascii=False) + "\n")
+            count += 1
+            failures += "error" in card_data
+    return count, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-parse Bahrain ID card dumps to JSON Lines")
+    parser.add_argument("paths", nargs="+", help="dump directories, archives or directories containing them")
+    parser.add_argument("--output", "-o", help="JSON Lines output file (default: stdout)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=16, help="dumps handed to a worker at a time")
+    args = parser.parse_args()
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        count, failures = reparse(args.paths, output, args.workers, args.chunksize)
+    finally:
+        if args.output:
+            output.close()
+    print(f"Parsed {count} dumps, {failures} failed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""
+Simulated Bahrain ID cards and readers for testing and benchmarking without hardware.
+
+The simulated readers expose the same createConnection()/connect()/getATR()/transmit()
+interface as pyscard readers, so they can be handed to BahrainIDCard through a
+SimulatedTransport:
+
+    card = SimulatedCard("V2", latency=0.01)
+    bhcard = BahrainIDCard(transport=SimulatedTransport([SimulatedReader("Sim 0", card)]))
+"""
+import random
+import time
+from smartcard.Exceptions import CardConnectionException, NoCardException
+
+# ATRs that BahrainIDCard.find_and_connect_reader maps to each card version
+CARD_ATRS = {
+    "V1": "3B670000A8104101",
+    "V2": "3B7A9600008065A2010101833E",
+    "V2.1": "3B7A9600008065A2010101833E",
+    "V4": "3B7F96000080318065B0850300EF120FFE829000"
+}
+
+MAIN_APPLET_AID = bytes.fromhex("D4990000010101000100000001")
+V2_SERIAL_APPLET_AID = bytes.fromhex("A0000000183003010000000000000000")
+CPR_DIR_V1_AID = bytes.fromhex("F000000078010001435052")
+IMM_DIR_V1_AID = bytes.fromhex("F000000078010002494D4D")
+
+# EF-DIR marker that identifies a V2.1 card
+V21_EF_DIR_MARKER = bytes.fromhex("3F0001019F08020311")
+
+SAMPLE_PERSON = {
+    "id_number": "880112345",
+    "names_en": ["AHMED", "ALI", "HASAN", "", "", "ALBAHRAINI"],
+    "names_ar": ["أحمد", "علي", "حسن", "", "", "البحريني"],
+    "gender": "M",
+    "birth_date": "19880115",
+    "blood_group": "O+",
+    "expiry_date": "20300101",
+    "issue_date": "20250101",
+    "issuing_authority": "IGA",
+    "email": "ahmed@example.com",
+    "contact_no": "33123456",
+    "residence_no": "17123456",
+    "flat_no": "12",
+    "building_no": "345",
+    "road_no": "2801",
+    "road_name": "AVENUE 28",
+    "road_name_ar": "شارع ٢٨",
+    "block_no": "328",
+    "block_name": "HOORA",
+    "block_name_ar": "الحورة",
+    "governorate_no": "1"
+}
+
+
+def _put(buf, offset, length, text, encoding="ascii"):
+    """Write text into a fixed-width, zero-padded field"""
+    raw = text.encode(encoding)[:length]
+    buf[offset:offset + len(raw)] = raw
+
+
+def _placeholder_image(size, length, seed):
+    """Return length bytes holding a JPEG, or JPEG-framed filler when PIL is unavailable"""
+    try:
+        from PIL import Image
+        import io
+        image = Image.new("L", size, color=seed % 256)
+        out = io.BytesIO()
+        image.save(out, format="JPEG", quality=50)
+        data = out.getvalue()
+        if len(data) <= length:
+            return data + bytes(length - len(data))
+    except ImportError:
+        pass
+    filler = bytes((seed + i) % 256 for i in range(length - 4))
+    return b"\xFF\xD8" + filler + b"\xFF\xD9"
+
+
+def build_personal_info(person, version):
+    """Build the Personal Information file for a card version"""
+    if version == "V1":
+        buf = bytearray(610)
+        base = 8
+        _put(buf, 602, 8, person["expiry_date"])
+    else:
+        buf = bytearray(597)
+        base = 0
+
+    _put(buf, base, 9, person["id_number"])
+    for i, name in enumerate(person["names_en"]):
+        _put(buf, base + 9 + i * 32, 32, name)
+    for i, name in enumerate(person["names_ar"]):
+        _put(buf, base + 201 + i * 64, 64, name, "utf-8")
+    _put(buf, base + 585, 1, person["gender"])
+
+    if version == "V1":
+        _put(buf, 594, 8, person["birth_date"])
+    else:
+        _put(buf, 586, 8, person["birth_date"])
+        _put(buf, 594, 3, person["blood_group"])
+    return bytes(buf)
+
+
+def build_card_info(person):
+    """Build the Card Information file (V2 family)"""
+    buf = bytearray(36)
+    _put(buf, 0, 8, person["expiry_date"])
+    _put(buf, 8, 8, person["issue_date"])
+    _put(buf, 16, 20, person["issuing_authority"])
+    return bytes(buf)
+
+
+def build_address_info(person, version):
+    """Build the Address Information file"""
+    buf = bytearray(711 if version == "V1" else 512)
+    fields = [
+        ("email", 0, 64), ("contact_no", 64, 12), ("residence_no", 76, 12),
+        ("flat_no", 105, 4), ("building_no", 109, 4), ("road_no", 116, 4),
+        ("road_name", 120, 64), ("road_name_ar", 184, 128), ("block_no", 312, 4),
+        ("block_name", 316, 64), ("block_name_ar", 380, 128), ("governorate_no", 508, 4)
+    ]
+    for key, offset, length in fields:
+        _put(buf, offset, length, person[key], "utf-8")
+    return bytes(buf)
+
+
+def build_photo_signature(version, seed):
+    """Build the Photo and Signature file"""
+    photo = _placeholder_image((150, 200), 4000, seed)
+    signature = _placeholder_image((200, 100), 2000, seed + 1)
+    if version == "V1":
+        return bytes(6) + photo + signature
+    return photo + signature
+
+
+class SimulatedCard:
+    """
+    In-process Bahrain ID card that answers the APDUs in BahrainIDCard.apdu_commands.
+
+    Args:
+        version (str): "V1", "V2", "V2.1" or "V4"
+        serial (str): Card serial number returned by the GET SERIAL commands
+        person (dict): Field values written into the card files, see SAMPLE_PERSON
+        latency (float): Seconds added to every APDU
+        byte_latency (float): Seconds added per command and response byte
+        error_rate (float): Probability of answering an APDU with 6F00
+        drop_rate (float): Probability of a transmit raising CardConnectionException
+        reset_on_drop (bool): Whether a dropped transmit also resets the card, so the
+            selection is lost as after a real card reset
+        extended_length (bool): Whether extended-length READ BINARY is accepted
+        seed (int): Seed for the error injection random generator
+    """
+
+    def __init__(self, version="V2", serial="12345678", person=None, latency=0.0,
+                 byte_latency=0.0, error_rate=0.0, drop_rate=0.0, reset_on_drop=False, extended_length=True, seed=0):
+        if version not in CARD_ATRS:
+            raise ValueError(f"Unknown card version: {version}")
+
+        self.version = version
+        self.serial = serial
+        self.person = dict(SAMPLE_PERSON, **(person or {}))
+        self.latency = latency
+        self.byte_latency = byte_latency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.reset_on_drop = reset_on_drop
+        self.extended_length = extended_length
+        self.random = random.Random(seed)
+        self.atr = list(bytes.fromhex(CARD_ATRS[version]))
+
+        self.apdu_count = 0
+        self.files = self.build_files(seed)
+        self.reset()
+
+    def build_files(self, seed):
+        """Build the elementary files, keyed by (directory, file ID)"""
+        person = self.person
+        if self.version == "V1":
+            return {
+                ("CPR", 0x0001): build_personal_info(person, self.version),
+                ("CPR", 0x0002): build_photo_signature(self.version, seed),
+                ("CPR", 0x0003): build_address_info(person, self.version),
+                ("IMM", 0x0001): bytes(range(72)),
+                ("IMM", 0x0002): bytes(range(53)),
+                ("IMM", 0x0003): bytes(range(39))
+            }
+
+        files = {
+            ("CPR", 0x0001): build_personal_info(person, self.version),
+            ("CPR", 0x0002): build_card_info(person),
+            ("CPR", 0x0003): build_photo_signature(self.version, seed),
+            ("CPR", 0x0005): build_address_info(person, self.version),
+            ("CPR", 0x0006): bytes(i % 256 for i in range(1590)),
+            ("IMM", 0x0001): bytes(range(6)),
+            ("IMM", 0x0002): bytes(range(47)),
+            ("IMM", 0x0003): bytes(range(33))
+        }
+        if self.version == "V2.1":
+            ef_dir = bytearray(335)
+            ef_dir[40:40 + len(V21_EF_DIR_MARKER)] = V21_EF_DIR_MARKER
+            files[("MF", 0x2F00)] = bytes(ef_dir)
+        return files
+
+    def reset(self):
+        """Reset the selection state, as after a card reset"""
+        self.applet = None
+        self.directory = None
+        self.current_file = None
+
+    def process(self, command):
+        """Process a command APDU and return (response, sw1, sw2)"""
+        self.apdu_count += 1
+        command = bytes(command)
+
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            if self.reset_on_drop:
+                self.reset()
+            raise CardConnectionException("Simulated transmission failure")
+        if self.error_rate and self.random.random() < self.error_rate:
+            return [], 0x6F, 0x00
+        if len(command) < 4:
+            return [], 0x67, 0x00
+
+        cla, ins, p1, p2 = command[:4]
+        if ins == 0xA4:
+            return self.select(p1, command[5:5 + command[4]] if len(command) > 5 else b"")
+        if ins == 0xB0:
+            return self.read_binary(cla, p1, p2, command[4:])
+        if command[:4] == bytes.fromhex("D0020000") and self.version == "V1":
+            return list(self.serial.encode("ascii").ljust(9, b"\x00")[:9]), 0x90, 0x00
+        if command[:4] == bytes.fromhex("80B80000") and self.version in ("V2", "V2.1"):
+            if self.applet != "SERIAL":
+                return [], 0x69, 0x85
+            return list(self.serial.encode("ascii").ljust(8, b"\x00")[:8]), 0x90, 0x00
+        if command[:4] == bytes.fromhex("80CA0101") and self.version == "V4":
+            response = b"\x01\x02\x03" + self.serial.encode("ascii").ljust(8, b"\x00")[:8]
+            return list(response.ljust(0x13, b"\x00")), 0x90, 0x00
+        return [], 0x6D, 0x00
+
+    def select(self, p1, data):
+        """Handle SELECT by AID, directory or file ID"""
+        if p1 == 0x04:
+            if data == MAIN_APPLET_AID:
+                self.applet, self.directory, self.current_file = "MAIN", None, None
+            elif data == V2_SERIAL_APPLET_AID and self.version in ("V2", "V2.1"):
+                self.applet, self.directory, self.current_file = "SERIAL", None, None
+            elif data == CPR_DIR_V1_AID and self.version == "V1":
+                self.directory, self.current_file = "CPR", None
+            elif data == IMM_DIR_V1_AID and self.version == "V1":
+                self.directory, self.current_file = "IMM", None
+            else:
+                return [], 0x6A, 0x82
+            return [], 0x90, 0x00
+
+        if len(data) != 2:
+            return [], 0x67, 0x00
+        file_id = (data[0] << 8) | data[1]
+
+        if p1 == 0x00 and self.version != "V1":
+            directories = {0x3F00: "MF", 0x0101: "CPR", 0x0301: "IMM"}
+            if file_id not in directories:
+                return [], 0x6A, 0x82
+            self.directory, self.current_file = directories[file_id], None
+            return [], 0x90, 0x00
+
+        if (self.directory, file_id) not in self.files:
+            return [], 0x6A, 0x82
+        self.current_file = (self.directory, file_id)
+        return [], 0x90, 0x00
+
+    def read_binary(self, cla, p1, p2, le_bytes):
+        """Handle READ BINARY with a short or extended Le"""
+        if cla != (0x80 if self.version == "V1" else 0x00):
+            return [], 0x6E, 0x00
+        if self.current_file is None:
+            return [], 0x69, 0x86
+
+        if len(le_bytes) == 1:
+            length = le_bytes[0] or 256
+        elif len(le_bytes) == 3 and le_bytes[0] == 0 and self.extended_length:
+            length = ((le_bytes[1] << 8) | le_bytes[2]) or 65536
+        else:
+            return [], 0x67, 0x00
+
+        data = self.files[self.current_file]
+        offset = (p1 << 8) | p2
+        if offset >= len(data):
+            return [], 0x6B, 0x00
+        response = data[offset:offset + length]
+        if len(response) < length:
+            return list(response), 0x62, 0x82
+        return list(response), 0x90, 0x00
+
+
+class SimulatedConnection:
+    """pyscard-style connection to the card in a SimulatedReader"""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.card = None
+
+    def connect(self, *args, **kwargs):
+        if self.reader.card is None:
+            raise NoCardException("No card in simulated reader", -1)
+        self.card = self.reader.card
+        self.card.reset()
+
+    def reconnect(self, *args, **kwargs):
+        self.connect()
+
+    def disconnect(self):
+        self.card = None
+
+    def getATR(self):
+        if self.card is None:
+            raise CardConnectionException("Not connected")
+        return list(self.card.atr)
+
+    def getReader(self):
+        return str(self.reader)
+
+    def transmit(self, command, *args, **kwargs):
+        card = self.card
+        if card is None or card is not self.reader.card:
+            raise CardConnectionException("Card removed from simulated reader")
+
+        response, sw1, sw2 = card.process(command)
+        delay = card.latency + card.byte_latency * (len(command) + len(response) + 2)
+        if delay:
+            time.sleep(delay)
+        return response, sw1, sw2
+
+
+class SimulatedReader:
+    """Simulated reader slot that can hold one SimulatedCard"""
+
+    def __init__(self, name, card=None):
+        self.name = name
+        self.card = card
+
+    def insert(self, card):
+        self.card = card
+
+    def remove(self):
+        self.card = None
+
+    def createConnection(self):
+        return SimulatedConnection(self)
+
+    def __str__(self):
+        return self.name
+
+    __repr__ = __str__
+
+
+class SimulatedCardEvent:
+    """Card passed to observers on insertion or removal, like a pyscard Card"""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.atr = list(reader.card.atr) if reader.card else []
+
+    def createConnection(self):
+        return self.reader.createConnection()
+
+    def __str__(self):
+        return str(self.reader)
+
+
+class SimulatedTransport:
+    """Transport for BahrainIDCard that lists simulated readers instead of PC/SC ones"""
+
+    def __init__(self, readers=None):
+        self.reader_list = list(readers or [])
+        self.observers = []
+
+    def readers(self):
+        return list(self.reader_list)
+
+    def add_observer(self, observer):
+        """Register a CardObserver; cards already inserted are reported right away"""
+        self.observers.append(observer)
+        present = [SimulatedCardEvent(r) for r in self.reader_list if r.card is not None]
+        if present:
+            observer.update(self, (present, []))
+
+    def delete_observer(self, observer):
+        if observer in self.observers:
+            self.observers.remove(observer)
+
+    def insert_card(self, reader, card):
+        """Insert a card into a reader and notify observers"""
+        reader.insert(card)
+        for observer in list(self.observers):
+            observer.update(self, ([SimulatedCardEvent(reader)], []))
+
+    def remove_card(self, reader):
+        """Remove the card from a reader and notify observers"""
+        event = SimulatedCardEvent(reader)
+        reader.remove()
+        for observer in list(self.observers):
+            observer.update(self, ([], [event]))
@@ -0,0 +1,108 @@
+"""
+Thumbnail decoding for the card photo and signature.
+
+JPEGs are decoded in draft mode, which lets the JPEG decoder scale down by a
+power of two while decoding, and then resized to the exact display size. The
+work runs on a background thread and the results are cached by content hash,
+so showing the same card again needs no decoding at all.
+
+PIL is imported on first use so importing this module stays cheap.
+"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+PHOTO_SIZE = (150, 200)
+SIGNATURE_SIZE = (200, 100)
+
+
+def thumbnail_key(data, size):
+    """Cache key for data decoded to size"""
+    return (hashlib.sha1(data).hexdigest(), size)
+
+
+def decode_thumbnail(data, size):
+    """
+    Decode a JPEG (or any PIL image) to a thumbnail of exactly size.
+
+    Args:
+        data (bytes): Encoded image
+        size (tuple): (width, height) of the thumbnail
+
+    Returns:
+        PIL.Image.Image: The decoded thumbnail
+    """
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    # Only JPEG supports draft mode, other formats ignore it
+    image.draft("RGB", size)
+    image = image.convert("RGB")
+    if image.size != size:
+        image = image.resize(size, Image.LANCZOS)
+    return image
+
+
+class ThumbnailCache:
+    """Thread-safe LRU cache of decoded thumbnails keyed by content hash and size"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            image = self.entries.get(key)
+            if image is not None:
+                self.entries.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self.lock:
+            self.entries[key] = image
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class ThumbnailLoader:
+    """Decode thumbnails on a background thread, serving repeats from a cache"""
+
+    def __init__(self, cache=None, max_workers=2):
+        self.cache = cache if cache is not None else ThumbnailCache()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnail")
+
+    def load(self, data, size, callback):
+        """
+        Get the thumbnail of data at size.
+
+        A cached thumbnail is returned right away and callback is not called.
+        Otherwise None is returned, and callback(key, image) is called from a
+        worker thread once decoding is done, or callback(key, exception) on failure.
+
+        Returns:
+            tuple: (key, cached PIL image or None)
+        """
+        data = bytes(data)
+        key = thumbnail_key(data, size)
+        image = self.cache.get(key)
+        if image is not None:
+            return key, image
+
+        def decode():
+            try:
+                decoded = decode_thumbnail(data, size)
+            except Exception as e:
+                callback(key, e)
+                return
+            self.cache.put(key, decoded)
+            callback(key, decoded)
+
+        self.executor.submit(decode)
+        return key, None
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)